@@ -1,28 +1,53 @@
 from bson import ObjectId
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, current_app
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, current_app, Response, stream_with_context
 from flask_bcrypt import Bcrypt
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
+import json
 import os
+import threading
 
 #Import advanced NLP pipeline (keep your existing nlp.py)
-from nlp import extract_text_from_file, generate_flashcards_from_file, is_answer_correct
+from nlp import extract_text_from_file, generate_flashcards_from_file, iter_flashcards_from_file, is_answer_correct, grade_answers, text_cache, ENGINES
+
+#Background generation jobs
+import jobs
+import lazy_deps
+import memory_budget
+import metrics
+import upload_store
+import drafts
+from card_store import save_cards
+from queries import set_summaries
+from indexes import ensure_indexes, check_query_plans
+from mastery import record_answer, record_answers
+from card_cache import card_cache, with_progress
 
 #Import blueprint that contains progress routes
 from user_progress import progress_bp
+from card_api import card_api_bp, set_summary
+from scheduler import DUE_BATCH_SIZE
+from dedupe import dedupe_cards
 
 # Environment + Flask Setup
 load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'fallback_secret')
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Werkzeug rejects bigger requests before parsing them; upload_store enforces the exact file size
+app.config['MAX_CONTENT_LENGTH'] = (upload_store.UPLOAD_MAX_MB + 1) * 1024 * 1024
+# Stream cards to the review page as they are generated instead of waiting for the whole deck
+app.config['STREAM_GENERATION'] = os.environ.get('STREAM_GENERATION', 'false').lower() == 'true'
 ALLOWED_EXTENSIONS = {'txt','doc','docx','pdf','ppt','pptx','png','jpg','jpeg'}
+MAX_BATCH_ANSWERS = 500
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 #MongoDB Setup
-client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), event_listeners=[metrics.MongoMetrics()])
 db = client['flashcarddb']   
 users = db['users']
 flashcards = db['flashcards']
@@ -32,10 +57,39 @@ progress = db['progress']
 #Expose db for blueprints to use current_app.db
 app.db = db
 
+# In the background, so an unreachable database doesn't hold up startup
+threading.Thread(target=ensure_indexes, args=(db,), daemon=True).start()
+
+
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create the indexes declared in indexes.py."""
+    ensure_indexes(db)
+
+
+@app.cli.command("prune-uploads")
+def prune_uploads_command():
+    """Delete stored uploads that no generation needs any more."""
+    print(f"Removed {upload_store.prune(db, app.config['UPLOAD_FOLDER'])} stored uploads")
+
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    """Fail if any route's query shape would scan a whole collection."""
+    if check_query_plans(db):
+        raise SystemExit(1)
+
 bcrypt = Bcrypt(app)
 
+# Request timings, /metrics (Prometheus text) and the opt-in sampling profiler
+metrics.init_app(app)
+
 # Register blueprint (no prefix so endpoints are global, matching existing frontend)
 app.register_blueprint(progress_bp)
+app.register_blueprint(card_api_bp)
+
+# Startup report: heavy NLP libraries should only show up once an upload needs them
+print(f"Startup dependency report: {lazy_deps.report()}")
 
 
 #Auth Routes 
@@ -55,8 +109,12 @@ def signup():
             flash("User already exists!")
             return redirect(url_for('welcome'))
 
-        # Create user
-        result = users.insert_one({'username': username, 'password': password})
+        # Create user (the unique index on username also catches two signups racing)
+        try:
+            result = users.insert_one({'username': username, 'password': password})
+        except DuplicateKeyError:
+            flash("User already exists!")
+            return redirect(url_for('welcome'))
 
         # Auto login
         session['username'] = username
@@ -120,13 +178,14 @@ def create_flashcard():
     sets = list(flashcardsets.find({'user_id': user_id}))
     if request.method == 'POST':
         set_id = request.form['flashcard_set_id']
-        flashcards.insert_one({
+        save_cards(db, [{
             'user_id': user_id,
             'set_id': ObjectId(set_id),
             'question': request.form['question'],
             'answer': request.form['answer'],
             'created_at': datetime.utcnow()
-        })
+        }])
+        card_cache.invalidate(flashcards, set_id)
         flash('Flashcard created!')
         return redirect(url_for('view_set', set_id=set_id))
     return render_template('create_flashcards.html', flashcard_sets=sets)
@@ -136,14 +195,11 @@ def create_flashcard():
 @app.route('/set/<set_id>')
 def view_set(set_id):
 
-    cards = list(flashcards.find({'set_id': ObjectId(set_id)}))
+    cards = card_cache.get(flashcards, set_id)
     set_data = flashcardsets.find_one({'_id': ObjectId(set_id)})
 
     set_data['_id'] = str(set_data['_id'])
 
-    for c in cards:
-        c['_id'] = str(c['_id'])
-
     return render_template('view_set.html',
                            set_data=set_data,
                            flashcards=cards)
@@ -160,46 +216,170 @@ def upload_notes_ajax():
         
    
         target_lang = request.form.get('target_lang', 'en') 
+        engine = request.form.get('engine', 'heuristic')
+        if engine not in ENGINES:
+            engine = 'heuristic'
 
         if file.filename == '':
             return jsonify({"ok": False, "error": "No file selected"}), 400
 
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-
-          
-            flashcards_generated = generate_flashcards_from_file(filepath, language=target_lang)
-
-            if not flashcards_generated:
-                return jsonify({"ok": False, "error": "AI could not find enough text."}), 200
-
-            # Store in session, including the language used
-            session['temp_generated'] = [
-                {
-                    "question": c.get("question",""), 
-                    "answer": c.get("answer",""), 
-                    "score": c.get("score", 0),
-                    "visual_explanation": c.get("visual_explanation"),
-                    "image_url": c.get("image_url"),
-                    "language": target_lang  # NEW: keep track of the language
-                }
-                for c in flashcards_generated
-            ]
-            session['temp_filename'] = filename
-
-            return jsonify({"ok": True, "redirect": url_for('review_temp')})
+            # Stored once per distinct content as <sha256><ext>; the name is also the content key
+            try:
+                upload = upload_store.save_upload(db, file, app.config['UPLOAD_FOLDER'])
+            except upload_store.UploadTooLarge as e:
+                return jsonify({"ok": False, "error": str(e)}), 413
+            filepath = upload_store.path_for(app.config['UPLOAD_FOLDER'], upload)
+
+            if app.config['STREAM_GENERATION']:
+                return jsonify({"ok": True, "redirect": url_for('review_stream', filename=upload, lang=target_lang, engine=engine, name=filename)})
+
+            # Generation runs in the background, the browser polls upload_status
+            job_id = jobs.submit_generation(filepath, target_lang, session.get('user_id'), filename, engine,
+                                            upload=upload, content_hash=upload_store.content_hash(upload))
+            if not job_id:
+                upload_store.release(db, upload)
+                return jsonify({"ok": False, "error": "The server is busy, please try again shortly."}), 503
+
+            return jsonify({
+                "ok": True,
+                "job_id": job_id,
+                "status_url": url_for('upload_status', job_id=job_id),
+                "result_url": url_for('upload_result', job_id=job_id)
+            }), 202
         
         return jsonify({"ok": False, "error": "File type not allowed"}), 400
 
+    except RequestEntityTooLarge as e:
+        return upload_too_large(e)
     except Exception as e:
         print(f"Server Error: {str(e)}")
         return jsonify({"ok": False, "error": str(e)}), 500
 
+
+@app.route('/upload_status/<job_id>')
+def upload_status(job_id):
+    status = jobs.job_status(job_id, session.get('user_id'))
+    if not status:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    return jsonify({"ok": True, **status})
+
+
+@app.route('/upload_result/<job_id>')
+def upload_result(job_id):
+    status = jobs.job_status(job_id, session.get('user_id'))
+    if not status:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    if status["state"] not in ("failed", "done"):
+        return jsonify({"ok": False, "error": "Job still running"}), 409
+
+    upload = jobs.job_upload(job_id, session.get('user_id'))
+    result = jobs.pop_result(job_id, session.get('user_id'))
+    if result is None:
+        # Another request already collected this job
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    # Only the request that collected the job releases its upload, and it's done with it either way
+    upload_store.release(db, upload)
+    if status["state"] == "failed":
+        print(f"Server Error: {status['error']}")
+        return jsonify({"ok": False, "error": status["error"]}), 500
+
+    flashcards_generated, filename, target_lang = result
+    if not flashcards_generated:
+        return jsonify({"ok": False, "error": "AI could not find enough text."}), 200
+
+    # The deck goes to the draft store, the session only keeps its id
+    cards = [temp_card(c, target_lang) for c in flashcards_generated]
+    session['temp_draft_id'] = drafts.create_draft(db, session.get('user_id'), cards, filename, target_lang)
+
+    return jsonify({"ok": True, "redirect": url_for('review_temp')})
+
+
+def user_set_choices(user_id):
+    # Sets a reviewed deck can be added to instead of starting a new one
+    return [{"_id": str(s["_id"]), "name": s.get("name", "Unnamed Set")}
+            for s in flashcardsets.find({"user_id": ObjectId(user_id)}, {"name": 1})]
+
+
+def temp_card(c, target_lang):
+    return {
+        "question": c.get("question",""), 
+        "answer": c.get("answer",""), 
+        "score": c.get("score", 0),
+        "visual_explanation": c.get("visual_explanation"),
+        "image_url": c.get("image_url"),
+        "language": target_lang  # NEW: keep track of the language
+    }
+
+
+#Streamed Generation (Server-Sent Events) 
+@app.route('/review-stream/<filename>')
+def review_stream(filename):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    target_lang = request.args.get('lang', 'en')
+    engine = request.args.get('engine', 'heuristic')
+    # The session can't change mid-stream, so the (empty) draft is created now and filled when the stream ends
+    name = request.args.get('name', filename)
+    session['temp_draft_id'] = drafts.create_draft(db, session['user_id'], [], name, target_lang, complete=False)
+    return render_template(
+        'study_flashcards.html',
+        flashcard_set={"name": "Unsaved Generated Set"},
+        flashcards=[],
+        temp_mode=True,
+        user_sets=user_set_choices(session['user_id']),
+        stream_url=url_for('stream_flashcards', filename=filename, lang=target_lang, engine=engine)
+    )
+
+
+@app.route('/stream_flashcards/<filename>')
+def stream_flashcards(filename):
+    if 'user_id' not in session:
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+
+    filepath = upload_store.path_for(app.config['UPLOAD_FOLDER'], filename)
+    if not filepath or not os.path.exists(filepath):
+        return jsonify({"ok": False, "error": "File not found"}), 404
+
+    target_lang = request.args.get('lang', 'en')
+    engine = request.args.get('engine', 'heuristic')
+    if engine not in ENGINES:
+        engine = 'heuristic'
+    user_id = session['user_id']
+    draft_id = session.get('temp_draft_id')
+    if not drafts.get_draft(db, draft_id, user_id):
+        return jsonify({"ok": False, "error": "Draft not found"}), 404
+
+    def events():
+        cards = []
+        try:
+            for c in iter_flashcards_from_file(filepath, language=target_lang, engine=engine,
+                                               content_hash=upload_store.content_hash(filename)):
+                card = temp_card(c, target_lang)
+                cards.append(card)
+                yield f"event: card\ndata: {json.dumps(card)}\n\n"
+        except Exception as e:
+            print(f"Server Error: {str(e)}")
+            yield f"event: failed\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        finally:
+            upload_store.release(db, filename)
+
+        drafts.set_cards(db, draft_id, user_id, cards)
+        yield f"event: done\ndata: {json.dumps({'count': len(cards)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/review-temp')
 def review_temp():
-    temp = session.get('temp_generated')
+    draft = drafts.get_draft(db, session.get('temp_draft_id'), session.get('user_id'))
+    temp = draft["cards"] if draft else None
     if not temp:
         flash('No generated flashcards to review yet.', 'warning')
         return redirect(url_for('dashboard'))
@@ -209,7 +389,8 @@ def review_temp():
         'study_flashcards.html',
         flashcard_set=flashcard_set,
         flashcards=temp,
-        temp_mode=True
+        temp_mode=True,
+        user_sets=user_set_choices(session['user_id'])
     )
 
 @app.route('/view_sets')
@@ -218,24 +399,8 @@ def view_sets():
         return redirect(url_for('login'))
 
     user_id = ObjectId(session['user_id'])
-    sets = list(flashcardsets.find({'user_id': user_id}))
-
-    for s in sets:
-
-        # convert ObjectId once
-        set_object_id = s['_id']
-        s['_id'] = str(set_object_id)
-
-        cards = list(flashcards.find({'set_id': set_object_id}))
-        s['count'] = len(cards)
-
-        prog = list(progress.find({'set_id': set_object_id}))
-
-        if prog:
-            avg = sum(p.get('score', 0) for p in prog) / len(prog)
-            s['avg_score'] = avg
-        else:
-            s['avg_score'] = 0
+    # Card counts and average scores come back with the sets in a single aggregation
+    sets = set_summaries(db, user_id)
 
     return render_template('view_sets.html', sets=sets)
 
@@ -243,8 +408,14 @@ def view_sets():
 #Preview Generated Flashcards 
 @app.route('/preview-generated/<filename>')
 def preview_generated_flashcards(filename):
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    generated = generate_flashcards_from_file(filepath)
+    # filename is a stored upload name (<sha256><ext>), which also keys the extraction cache
+    filepath = upload_store.path_for(app.config['UPLOAD_FOLDER'], filename)
+    if not filepath or not os.path.exists(filepath):
+        return "File not found", 404
+    try:
+        generated = generate_flashcards_from_file(filepath, content_hash=upload_store.content_hash(filename))
+    except (memory_budget.DocumentTooLarge, memory_budget.MemoryBudgetExceeded) as e:
+        return str(e), 413
     return render_template('preview_generated.html', flashcards=generated)
 
 
@@ -256,25 +427,32 @@ def save_generated_flashcards():
 
     user_id = ObjectId(session['user_id'])
     set_name = request.form.get('set_name')
-    temp_cards = session.get('temp_generated', [])
+    target_set_id = request.form.get('target_set_id')
+    draft_id = session.get('temp_draft_id')
+    draft = drafts.get_draft(db, draft_id, session['user_id'])
+    temp_cards = draft["cards"] if draft else []
+    # A streamed draft only gets its cards when generation finishes; never save an empty set
+    if not draft or not draft.get("complete", True) or not temp_cards:
+        flash('These flashcards are not ready to be saved yet.', 'warning')
+        return redirect(url_for('dashboard'))
     
     set_lang = temp_cards[0].get('language', 'en') if temp_cards else 'en'
 
     timestamp = datetime.utcnow().strftime("%H:%M")
     display_name = f"{set_name} ({timestamp})" if set_name else f"New Set ({timestamp})"
 
-    set_id = flashcardsets.insert_one({
+    now = datetime.utcnow()
+    set_doc = {
         'user_id': user_id,
         'name': display_name, # Using the unique name
         'language': set_lang, 
-        'created_at': datetime.utcnow()
-    }).inserted_id
+        'created_at': now
+    }
 
-    # 2. Save the individual cards
-    for card in temp_cards:
-        flashcards.insert_one({ 
+    # 2. Save the set and its cards together (batched, in one transaction when supported)
+    cards = [
+        { 
             'user_id': user_id,
-            'set_id': set_id,
             'question': card.get('question'),
             'answer': card.get('answer'),
             'language': card.get('language', set_lang), 
@@ -283,11 +461,34 @@ def save_generated_flashcards():
             'status': 'red',
             'attempts': 0,
             'correct_attempts': 0,
-            'created_at': datetime.utcnow()
-        })
+            'created_at': now
+        }
+        for card in temp_cards
+    ]
+
+    target_set = None
+    if target_set_id:
+        try:
+            target_set = flashcardsets.find_one({'_id': ObjectId(target_set_id), 'user_id': user_id}, {'_id': 1})
+        except Exception:
+            target_set = None
+
+    if target_set:
+        # Adding to an existing set: skip cards that repeat one it already has
+        set_id = target_set['_id']
+        existing = flashcards.find({'set_id': set_id, 'user_id': user_id}, {'question': 1, 'answer': 1})
+        new_cards = dedupe_cards(cards, existing)
+        for card in new_cards:
+            card['set_id'] = set_id
+        save_cards(db, new_cards)
+        if len(new_cards) < len(cards):
+            flash(f'Skipped {len(cards) - len(new_cards)} cards already in this set.', 'info')
+    else:
+        set_id = save_cards(db, cards, set_doc=set_doc)
+    card_cache.invalidate(flashcards, set_id)
 
-    session.pop('temp_generated', None)
-    session.pop('temp_filename', None)
+    drafts.delete_draft(db, draft_id, session['user_id'])
+    session.pop('temp_draft_id', None)
 
     # 3. Now set_lang is guaranteed to exist
     flash(f'Set saved successfully! Starting your quiz...', 'success')
@@ -305,26 +506,21 @@ def study_flashcards(set_id):
     if not flashcard_set:
         return "Set not found", 404
 
-    cards = list(flashcards.find({"set_id": ObjectId(set_id), "user_id": user_id}))
+    # The page fetches its cards from the card API; only the counts are rendered here
+    summary = set_summary(flashcards, set_id, user_id)
     
     # Convert the set ID
     flashcard_set["_id"] = str(flashcard_set["_id"])
-    
-    for card in cards:
-        card["_id"] = str(card["_id"])
-        if "set_id" in card:
-            card["set_id"] = str(card["set_id"])
-        if "user_id" in card:
-            card["user_id"] = str(card["user_id"])
 
-    total_cards = len(cards)
-    mastered_count = sum(1 for c in cards if c.get('status') == 'green' or c.get('mastery_score', 0) >= 0.8)
-    percent = int((mastered_count / total_cards) * 100) if total_cards > 0 else 0
+    total_cards = summary["total"]
+    percent = int((summary["mastered"] / total_cards) * 100) if total_cards > 0 else 0
 
     return render_template(
         "study_flashcards.html",
         flashcard_set=flashcard_set,
-        flashcards=cards,
+        flashcards=[],
+        cards_url=url_for("card_api.set_cards", set_id=set_id, view="study"),
+        total_cards=total_cards,
         set_id=set_id,
         mastery_percent=percent,
         temp_mode=False
@@ -342,28 +538,19 @@ def quiz_flashcards(set_id):
     if not flashcard_set:
         return "Set not found", 404
 
-    # Fetch the cards
-    cards = list(flashcards.find({"set_id": ObjectId(set_id), "user_id": user_id}))
-    
-    # Progress calculations
-    total = len(cards)
-    mastered = sum(1 for c in cards if c.get('status') == 'green')
+    # Progress calculations (the quiz page fetches the next due cards itself)
+    summary = set_summary(flashcards, set_id, user_id)
+    total = summary["total"]
+    mastered = summary["counts"]["green"]
     percent = int((mastered / total) * 100) if total > 0 else 0
 
-    #Convert ObjectIds to Strings 
     flashcard_set["_id"] = str(flashcard_set["_id"])
-    for card in cards:
-        card["_id"] = str(card["_id"])
-        # If set_id is also in the card object, convert it too
-        if "set_id" in card:
-            card["set_id"] = str(card["set_id"])
-        if "user_id" in card:
-            card["user_id"] = str(card["user_id"])
 
     return render_template(
         "quiz_flashcards.html",
         flashcard_set=flashcard_set,
-        flashcards=cards, # This is now safe for |tojson
+        due_url=url_for("card_api.due_set_cards", set_id=set_id, view="quiz"),
+        total_due=min(total, DUE_BATCH_SIZE),
         set_id=str(set_id),
         mastery_percent=percent
     )
@@ -384,27 +571,13 @@ def mastery_mode(set_id):
     # Convert the set's own ID to string
     flashcard_set["_id"] = str(flashcard_set["_id"])
 
-    # Fetch and CLEAN the cards explicitly
-    raw_cards = list(flashcards.find({"set_id": ObjectId(set_id), "user_id": user_id}))
-    
-    clean_cards = []
-    for card in raw_cards:
-        clean_cards.append({
-            "_id": str(card["_id"]),
-            "set_id": str(card["set_id"]),
-            "question": card.get("question", ""),
-            "answer": card.get("answer", ""),
-            "status": card.get("status", "red"),
-            "mastery_score": card.get("mastery_score", 0),
-            "attempts": card.get("attempts", 0),
-            "xp": card.get("xp", 0),
-            "current_streak": card.get("current_streak", 0),
-            "visual_explanation": card.get("visual_explanation", "")
-        })
+    # mastery_mode.js fetches due cards a batch at a time; the stats footer starts from these counts
+    summary = set_summary(flashcards, set_id, user_id)
 
     return render_template(
         "mastery_mode.html",
-        flashcards=clean_cards,  # Pass the cleaned list
+        due_url=url_for("card_api.due_set_cards", set_id=set_id, view="mastery"),
+        status_counts=summary["counts"],
         set_id=str(set_id),
         flashcard_set=flashcard_set
     )
@@ -429,59 +602,65 @@ def check_mastery_answer():
     card_id = data["card_id"]
     user_answer = data["user_answer"]
 
-    card = flashcards.find_one({"_id": ObjectId(card_id)})
+    # Only the answer is needed to grade; all counters are updated atomically by MongoDB
+    card = flashcards.find_one({"_id": ObjectId(card_id)}, {"answer": 1})
     if not card:
         return jsonify({"error": "Card not found"}), 404
 
-    # Get current stats or default to 0
-    attempts = card.get("attempts", 0) + 1
-    correct_attempts = card.get("correct_attempts", 0)
-    streak = card.get("current_streak", 0)
-    xp = card.get("xp", 0)
-
     is_correct = is_answer_correct(user_answer, card["answer"])
 
-    if is_correct:
-        correct_attempts += 1
-        streak += 1
-        xp += 10
-    else:
-        streak = 0
+    updated = record_answer(flashcards, ObjectId(card_id), is_correct)
+    if not updated:
+        return jsonify({"error": "Card not found"}), 404
 
-    # Calculate Accuracy
-    accuracy = correct_attempts / attempts
-    # Use the AI generation score as a baseline for difficulty/confidence
-    ai_conf = card.get("score", 0.7)
+    return jsonify({
+        "correct": is_correct,
+        "status": updated["status"],
+        "mastery_score": updated["mastery_score"],
+        "streak": updated["current_streak"],
+        "xp": updated["xp"]
+    })
 
-    # Mastery Calculation: 40% AI confidence, 60% user accuracy
-    mastery = round((0.4 * ai_conf) + (0.6 * accuracy), 2)
+#  Batch Answer Check (timed quizzes, offline sessions syncing) 
+@app.route("/check_answers_batch", methods=["POST"])
+def check_answers_batch():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
+    data = request.get_json(silent=True) or {}
+    answers = data.get("answers") or []
+    update_mastery = data.get("mode", "mastery") == "mastery"
+    if len(answers) > MAX_BATCH_ANSWERS:
+        return jsonify({"error": f"At most {MAX_BATCH_ANSWERS} answers per batch"}), 400
+    try:
+        card_ids = [ObjectId(a["card_id"]) for a in answers]
+    except Exception:
+        return jsonify({"error": "Invalid card_id"}), 400
 
-    if mastery >= 0.8:
-        status = "green"
-    elif mastery >= 0.5:
-        status = "amber"
-    else:
-        status = "red"
-
-    flashcards.update_one(
-        {"_id": ObjectId(card_id)},
-        {"$set": {
-            "attempts": attempts,
-            "correct_attempts": correct_attempts,
-            "mastery_score": mastery,
-            "status": status,
-            "current_streak": streak,
-            "xp": xp
-        }}
-    )
+    # One query for all the stored answers, one vectorized grading pass, one bulk write
+    user_id = ObjectId(session["user_id"])
+    stored = {c["_id"]: c["answer"] for c in flashcards.find({"_id": {"$in": card_ids}, "user_id": user_id}, {"answer": 1})}
+    known = [(card_id, a.get("user_answer", "")) for card_id, a in zip(card_ids, answers) if card_id in stored]
+    grades = grade_answers([user_answer for _, user_answer in known], [stored[card_id] for card_id, _ in known])
+
+    updated = record_answers(flashcards, [(card_id, ok) for (card_id, _), ok in zip(known, grades)]) if update_mastery else {}
+
+    results = []
+    for (card_id, _), ok in zip(known, grades):
+        result = {"card_id": str(card_id), "correct": ok}
+        card = updated.get(card_id)
+        if card:
+            result.update({
+                "status": card["status"],
+                "mastery_score": card["mastery_score"],
+                "streak": card["current_streak"],
+                "xp": card["xp"]
+            })
+        results.append(result)
 
     return jsonify({
-        "correct": is_correct,
-        "status": status,
-        "mastery_score": mastery,
-        "streak": streak,
-        "xp": xp
+        "results": results,
+        "missing": [str(card_id) for card_id in card_ids if card_id not in stored]
     })
 
 @app.route("/set/<set_id>/mastery-analytics")
@@ -491,7 +670,7 @@ def set_mastery_analytics(set_id):
 
     user_id = ObjectId(session["user_id"])
     set_data = flashcardsets.find_one({"_id": ObjectId(set_id), "user_id": user_id})
-    cards = list(flashcards.find({"set_id": ObjectId(set_id)}))
+    cards = with_progress(flashcards, set_id, card_cache.get(flashcards, set_id))
 
     # Stats for the sidebar
     total = len(cards)
@@ -501,12 +680,6 @@ def set_mastery_analytics(set_id):
     
     mastery_percent = int((green / total) * 100) if total > 0 else 0
 
-    # Clean cards for the UI
-    for c in cards:
-        c['_id'] = str(c['_id'])
-        c['status'] = c.get('status', 'red')
-        c['mastery_score'] = c.get('mastery_score', 0)
-
     return render_template(
         "view_mastery.html",
         set_data=set_data,
@@ -533,9 +706,29 @@ def edit_flashcard():
     )
 
     if result.modified_count > 0:
+        card = flashcards.find_one({"_id": ObjectId(card_id)}, {"set_id": 1})
+        card_cache.invalidate(flashcards, card and card.get("set_id"))
         return jsonify({"success": True})
     return jsonify({"success": False, "error": "Update failed or no changes made"})
 
+#  Cache Stats 
+@app.route("/cache_stats")
+def cache_stats():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    # Counters are per process; generation jobs keep their own in the worker processes
+    return jsonify({"extracted_text": text_cache.stats(), "cards": card_cache.stats()})
+
+@app.route("/dependency_report")
+def dependency_report():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(lazy_deps.report())
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"ok": False, "error": f"File is larger than {upload_store.UPLOAD_MAX_MB} MB"}), 413
+
 #  File Utility 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -0,0 +1,100 @@
+# bench_engines.py
+# Compares the colon heuristic with the spaCy engine on the sample uploads and on a synthetic textbook.
+#
+#   python benchmarks/bench_engines.py                      # uploads/ + 300 synthetic pages
+#   python benchmarks/bench_engines.py notes.pdf --pages 1000 --n-process 4
+#
+# Extraction is timed separately (and cached), so the numbers only cover candidate mining.
+
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp  # noqa: E402
+import spacy_engine  # noqa: E402
+from parallel_extract import extract_pdf_pages, extract_pptx_sections  # noqa: E402
+
+CHARS_PER_PAGE = 3000
+TERMS = ["Osmosis", "Mitochondria", "Photosynthesis", "A heuristic", "Refraction", "An algorithm",
+         "The nucleus", "Entropy", "A compiler", "Diffusion", "The cell membrane", "Recursion"]
+FILLER = ["Students should revise this before the exam.", "See the lecture slides for diagrams.",
+          "This topic links closely to last week's material.", "Questions often combine several ideas."]
+
+
+def synthetic_text(pages, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    while sum(len(line) + 1 for line in lines) < pages * CHARS_PER_PAGE:
+        term = rng.choice(TERMS)
+        kind = rng.random()
+        if kind < 0.2:
+            lines.append(f"{term}: the key idea behind topic {rng.randint(1, 500)} in this module")
+        elif kind < 0.6:
+            lines.append(f"{term} is a process that explains observation {rng.randint(1, 500)} in the lab. "
+                         + rng.choice(FILLER))
+        else:
+            lines.append(" ".join(rng.choice(FILLER) for _ in range(3)))
+    return "\n".join(lines)
+
+
+def page_count(filepath, text):
+    ext = os.path.splitext(filepath)[1].lower()
+    try:
+        if ext == ".pdf":
+            return len(extract_pdf_pages(filepath))
+        if ext == ".pptx":
+            return len(extract_pptx_sections(filepath))
+    except Exception:
+        pass
+    return max(1, len(text) / CHARS_PER_PAGE)
+
+
+def timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--pages", type=int, default=300, help="size of the synthetic document")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=spacy_engine.SPACY_BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, default=spacy_engine.SPACY_N_PROCESS)
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("uploads/*.pdf") + glob.glob("uploads/*.docx") + glob.glob("uploads/*.txt"))
+    documents = []
+    for filepath in files:
+        text = nlp.extract_text_from_file(filepath)
+        if text.strip():
+            documents.append((os.path.basename(filepath), text, page_count(filepath, text)))
+    documents.append((f"synthetic ({args.pages} pages)", synthetic_text(args.pages), args.pages))
+
+    # Load the model up front so it isn't counted against the first document
+    nlp.get_spacy_model()
+
+    print(f"{'document':40} {'pages':>7} {'engine':>10} {'cards':>6} {'seconds':>9} {'pages/s':>9}")
+    for name, text, pages in documents:
+        runs = [
+            ("heuristic", lambda: nlp._line_candidates(text)),
+            ("spacy", lambda: nlp._line_candidates(text)
+                + spacy_engine.definition_candidates(text, batch_size=args.batch_size, n_process=args.n_process)),
+        ]
+        for engine, fn in runs:
+            seconds, candidates = timed(fn, args.repeat)
+            print(f"{name[:40]:40} {pages:>7.0f} {engine:>10} {len(candidates):>6} {seconds:>9.3f} {pages / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
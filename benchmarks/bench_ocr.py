@@ -0,0 +1,127 @@
+# bench_ocr.py
+# OCR throughput on uploads/cells.jpg and on a synthetic scanned PDF (pages rendered as images,
+# no text layer), in pages per minute: preprocessing alone, cold recognition with one worker and
+# with the pool, and warm (cached) runs.
+#
+#   python benchmarks/bench_ocr.py
+#   python benchmarks/bench_ocr.py notes.jpg --pages 40 --workers 1,2,4
+#
+# Needs the tesseract binary (or tesserocr) for the recognition columns; without it only
+# preprocessing is timed.
+
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+_WORKDIR = tempfile.mkdtemp(prefix="bench_ocr_")
+# Must be set before ocr is imported
+os.environ["OCR_CACHE_DIR"] = os.path.join(_WORKDIR, "ocr")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr  # noqa: E402
+import lazy_deps  # noqa: E402
+from disk_cache import DiskCache  # noqa: E402
+from bench_engines import synthetic_text  # noqa: E402
+
+SCAN_DPI = 200
+PAGE_SIZE = (int(8.27 * SCAN_DPI), int(11.69 * SCAN_DPI))  # A4
+LINES_PER_PAGE = 45
+
+
+def synthetic_scan(pages, path):
+    # A PDF whose pages are JPEG images of text, like the output of a document scanner
+    Image = lazy_deps.load("PIL.Image")
+    ImageDraw = lazy_deps.load("PIL.ImageDraw")
+    ImageFont = lazy_deps.load("PIL.ImageFont")
+    font = ImageFont.load_default(size=28)
+    lines = [line[:90] for line in synthetic_text(pages).split("\n")]
+
+    images = []
+    for page in range(pages):
+        image = Image.new("L", PAGE_SIZE, 235)
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(lines[page * LINES_PER_PAGE:(page + 1) * LINES_PER_PAGE]):
+            draw.text((120, 140 + row * 46), line, fill=30, font=font)
+        images.append(image)
+    images[0].save(path, "PDF", resolution=SCAN_DPI, save_all=True, append_images=images[1:])
+    return path
+
+
+def pdf_images(path):
+    reader = lazy_deps.load("PyPDF2").PdfReader(path)
+    return [ocr.page_images(page)[0] for page in reader.pages]
+
+
+def cold_cache():
+    ocr.ocr_cache = DiskCache(tempfile.mkdtemp(dir=_WORKDIR), max_bytes=1 << 30, max_age_seconds=3600)
+
+
+def tesseract_available():
+    try:
+        lazy_deps.load("tesserocr")
+        return True
+    except ImportError:
+        pass
+    try:
+        lazy_deps.load("pytesseract").get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def per_minute(count, seconds):
+    return count / seconds * 60 if seconds else 0
+
+
+def bench(name, images, workers, recognise):
+    Image = lazy_deps.load("PIL.Image")
+    start = time.perf_counter()
+    for data in images:
+        ocr.preprocess(Image.open(io.BytesIO(data)))
+    row = {"preprocess": per_minute(len(images), time.perf_counter() - start)}
+
+    if recognise:
+        for count in workers:
+            ocr.OCR_WORKERS = count
+            ocr._pool.reset()
+            cold_cache()
+            start = time.perf_counter()
+            texts = ocr.ocr_many(images)
+            row[f"cold x{count}"] = per_minute(len(images), time.perf_counter() - start)
+        start = time.perf_counter()
+        ocr.ocr_many(images)
+        row["cached"] = per_minute(len(images), time.perf_counter() - start)
+        row["chars/page"] = sum(len(t) for t in texts) / len(images)
+
+    print(f"{name[:32]:32} {len(images):>6} " + " ".join(f"{k}={v:,.0f}" for k, v in row.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="*", help="image files (default: uploads/cells.jpg)")
+    parser.add_argument("--pages", type=int, default=20, help="pages in the synthetic scanned PDF")
+    parser.add_argument("--workers", default=f"1,{ocr.OCR_WORKERS}", help="comma separated pool sizes")
+    args = parser.parse_args()
+    workers = sorted({int(w) for w in args.workers.split(",") if w.strip()})
+
+    try:
+        recognise = tesseract_available()
+        if not recognise:
+            print("tesseract not found: timing preprocessing only")
+        print(f"{'document':32} {'pages':>6} pages per minute")
+        for path in args.images or ["uploads/cells.jpg"]:
+            with open(path, "rb") as f:
+                bench(os.path.basename(path), [f.read()], workers, recognise)
+        scan = synthetic_scan(args.pages, os.path.join(_WORKDIR, "scan.pdf"))
+        bench(f"synthetic scan ({args.pages} pages)", pdf_images(scan), workers, recognise)
+    finally:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
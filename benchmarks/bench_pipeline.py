@@ -0,0 +1,187 @@
+# bench_pipeline.py
+# End-to-end benchmark of the generation pipeline over the sample uploads and synthetic
+# documents: extraction, each generate_flashcards_from_file stage and answer checking.
+# Reports seconds per stage, pages per second, peak RSS and cards produced, and writes them
+# to JSON so a run can be compared with a stored baseline.
+#
+#   python benchmarks/bench_pipeline.py --output bench.json
+#   python benchmarks/bench_pipeline.py --baseline bench.json --tolerance 0.25
+#
+# Runs offline: translation uses the local backend, and the text cache, translation cache and
+# rendered images all go to a temporary directory, so every run starts cold.
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+_WORKDIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+# Must be set before nlp and translation are imported
+os.environ["TRANSLATION_BACKEND"] = "local"
+os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(_WORKDIR, "translations.sqlite3")
+os.environ["TEXT_CACHE_DIR"] = os.path.join(_WORKDIR, "extracted_text")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp  # noqa: E402
+import visuals  # noqa: E402
+import memory_budget  # noqa: E402
+from memory_budget import reset_peak_rss, peak_rss_mb  # noqa: E402
+from disk_cache import DiskCache  # noqa: E402
+from bench_engines import synthetic_text, page_count  # noqa: E402
+
+visuals.OUTPUT_DIR = os.path.join(_WORKDIR, "generated_images")
+
+DEFAULT_PATTERNS = ["uploads/*.pdf", "uploads/*.docx", "uploads/*.pptx", "uploads/*.txt"]
+
+
+def cold_text_cache():
+    nlp.text_cache = DiskCache(tempfile.mkdtemp(dir=_WORKDIR), max_bytes=1 << 30, max_age_seconds=3600)
+
+
+def stage_timer():
+    # generate_flashcards_from_file reports each stage as it starts; time the gaps between them
+    marks = []
+
+    def progress(stage):
+        marks.append((stage, time.perf_counter()))
+
+    def durations(end):
+        stops = [t for _, t in marks[1:]] + [end]
+        return {stage: stop - start for (stage, start), stop in zip(marks, stops)}
+
+    return progress, durations
+
+
+def misspell(answer):
+    # A plausible typed answer: one letter dropped from the middle
+    middle = len(answer) // 2
+    return answer[:middle] + answer[middle + 1:]
+
+
+def bench_document(name, filepath, pages, args):
+    result = {"document": name, "pages": pages}
+    reset_peak_rss()
+
+    best = {}
+    cards = []
+    for _ in range(args.repeat):
+        cold_text_cache()
+        start = time.perf_counter()
+        nlp.extract_text_from_file(filepath)
+        timings = {"extract": time.perf_counter() - start}
+
+        # Extraction is now cached, so the pipeline's own "extracting" stage is only the lookup
+        progress, durations = stage_timer()
+        cards = nlp.generate_flashcards_from_file(filepath, language=args.language, progress=progress, engine=args.engine)
+        timings.update(durations(time.perf_counter()))
+        for stage, seconds in timings.items():
+            best[stage] = min(best.get(stage, seconds), seconds)
+
+    answers = [card["answer"] for card in cards] * max(1, args.answers // max(1, len(cards)))
+    typed = [misspell(answer) for answer in answers]
+    start = time.perf_counter()
+    for user_answer, answer in zip(typed, answers):
+        nlp.is_answer_correct(user_answer, answer)
+    best["is_answer_correct"] = time.perf_counter() - start
+    start = time.perf_counter()
+    nlp.grade_answers(typed, answers)
+    best["grade_answers"] = time.perf_counter() - start
+
+    pipeline_seconds = sum(best.get(stage, 0) for stage in ("extract", "generating", "translating", "rendering"))
+    result.update({
+        "cards": len(cards),
+        "answers_checked": len(answers),
+        "seconds": {stage: round(seconds, 6) for stage, seconds in best.items()},
+        "pages_per_second": round(pages / pipeline_seconds, 2) if pipeline_seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # Returns (document, stage, old, new) for every stage that got slower than the tolerance allows
+    old_docs = {doc["document"]: doc for doc in baseline["documents"]}
+    regressions = []
+    for doc in results["documents"]:
+        old = old_docs.get(doc["document"])
+        if not old:
+            continue
+        for stage, seconds in doc["seconds"].items():
+            before = old["seconds"].get(stage)
+            # Sub-millisecond stages are mostly noise
+            if before and max(before, seconds) > 0.001 and seconds > before * (1 + tolerance):
+                regressions.append((doc["document"], stage, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--pages", default="50,500", help="comma separated sizes of the synthetic documents")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--language", default="es", help="'en' skips the translation stage")
+    parser.add_argument("--engine", default="heuristic", choices=nlp.ENGINES)
+    parser.add_argument("--bounded", action="store_true", help="force the bounded-memory mode for every document")
+    parser.add_argument("--answers", type=int, default=2000, help="answers checked per document")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args()
+    memory_budget.BOUNDED_MEMORY = args.bounded
+
+    try:
+        files = args.files or sorted(f for pattern in DEFAULT_PATTERNS for f in glob.glob(pattern))
+        documents = []
+        for filepath in files:
+            text = nlp.extract_text_from_file(filepath)
+            if text.strip():
+                documents.append((os.path.basename(filepath), filepath, page_count(filepath, text)))
+        for pages in (int(p) for p in args.pages.split(",") if p.strip()):
+            path = os.path.join(_WORKDIR, f"synthetic_{pages}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(synthetic_text(pages))
+            documents.append((f"synthetic ({pages} pages)", path, pages))
+
+        results = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "options": {"repeat": args.repeat, "language": args.language, "engine": args.engine, "bounded": args.bounded},
+            "documents": [],
+        }
+        print(f"{'document':40} {'pages':>6} {'cards':>6} {'extract':>8} {'generate':>9} {'translate':>10} "
+              f"{'render':>8} {'pages/s':>8} {'check/s':>9} {'rss MB':>7}")
+        for name, filepath, pages in documents:
+            doc = bench_document(name, filepath, pages, args)
+            results["documents"].append(doc)
+            s = doc["seconds"]
+            checks = doc["answers_checked"] / s["is_answer_correct"] if s["is_answer_correct"] else 0
+            print(f"{name[:40]:40} {pages:>6.0f} {doc['cards']:>6} {s.get('extract', 0):>8.3f} "
+                  f"{s.get('generating', 0):>9.3f} {s.get('translating', 0):>10.3f} {s.get('rendering', 0):>8.3f} "
+                  f"{doc['pages_per_second'] or 0:>8.0f} {checks:>9.0f} {doc['peak_rss_mb']:>7.0f}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            for document, stage, before, after in regressions:
+                print(f"REGRESSION {document}: {stage} {before:.3f}s -> {after:.3f}s")
+            if regressions:
+                sys.exit(1)
+            print(f"No stage slower than the baseline by more than {args.tolerance:.0%}")
+    finally:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
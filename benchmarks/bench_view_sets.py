@@ -0,0 +1,118 @@
+# bench_view_sets.py
+# Regression benchmark for the "my sets" page: the old per-set queries against the aggregation
+# in queries.set_summaries, on a seeded throwaway database.
+#
+#   python benchmarks/bench_view_sets.py --sets 200 --cards 50
+#
+# Needs a running MongoDB (MONGO_URI, default mongodb://localhost:27017). The database named by
+# --db is dropped before and after the run.
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from pymongo import MongoClient, monitoring  # noqa: E402
+
+from queries import set_summaries  # noqa: E402
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, sets, cards_per_set, progress_per_set):
+    user_id = ObjectId()
+    set_ids = db.flashcardsets.insert_many([
+        {"user_id": user_id, "name": f"Set {i}", "created_at": datetime.utcnow()} for i in range(sets)
+    ]).inserted_ids
+    rng = random.Random(1)
+    db.flashcards.insert_many([
+        {"user_id": user_id, "set_id": set_id, "question": f"Q{i}", "answer": "A" * 200, "status": "red"}
+        for set_id in set_ids for i in range(cards_per_set)
+    ])
+    progress = [
+        {"user_id": user_id, "set_id": set_id, "score": rng.randint(0, 10)}
+        for set_id in set_ids for _ in range(rng.randint(0, progress_per_set))
+    ]
+    if progress:
+        db.progress.insert_many(progress)
+    db.flashcards.create_index([("set_id", 1), ("user_id", 1)])
+    db.progress.create_index([("set_id", 1)])
+    db.flashcardsets.create_index([("user_id", 1)])
+    return user_id
+
+
+def old_view_sets(db, user_id):
+    # The route as it was before the aggregation
+    sets = list(db.flashcardsets.find({"user_id": user_id}))
+    for s in sets:
+        set_object_id = s["_id"]
+        s["_id"] = str(set_object_id)
+        s["count"] = len(list(db.flashcards.find({"set_id": set_object_id})))
+        prog = list(db.progress.find({"set_id": set_object_id}))
+        s["avg_score"] = sum(p.get("score", 0) for p in prog) / len(prog) if prog else 0
+    return sets
+
+
+def measure(fn, counter, repeat):
+    best = None
+    for _ in range(repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, counter.count, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=200)
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--progress", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="flashcarddb_bench")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), event_listeners=[counter])
+    client.drop_database(args.db)
+    db = client[args.db]
+    try:
+        user_id = seed(db, args.sets, args.cards, args.progress)
+
+        old_time, old_queries, old = measure(lambda: old_view_sets(db, user_id), counter, args.repeat)
+        new_time, new_queries, new = measure(lambda: set_summaries(db, user_id), counter, args.repeat)
+
+        def key(s):
+            return s["_id"], s["count"], round(s["avg_score"], 6)
+        if sorted(map(key, old)) != sorted(map(key, new)):
+            print("MISMATCH: aggregation results differ from the per-set queries")
+            sys.exit(1)
+
+        print(f"{args.sets} sets x {args.cards} cards")
+        print(f"per-set queries : {old_time * 1000:8.1f} ms, {old_queries} commands")
+        print(f"aggregation     : {new_time * 1000:8.1f} ms, {new_queries} commands")
+        print(f"speedup         : {old_time / new_time:8.1f}x")
+    finally:
+        client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
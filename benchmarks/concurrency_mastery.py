@@ -0,0 +1,92 @@
+# concurrency_mastery.py
+# Hammers /check_mastery_answer from many threads at once and checks that no answer was lost:
+# the card's attempts, correct_attempts and xp must match exactly what was sent.
+# Also prints p50/p99 latency of the endpoint.
+#
+#   python benchmarks/concurrency_mastery.py --threads 16 --answers 50
+#
+# Needs a running MongoDB (MONGO_URI); works on a throwaway database that is dropped afterwards.
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--answers", type=int, default=50, help="answers sent per thread")
+    parser.add_argument("--db", default="flashcarddb_concurrency")
+    args = parser.parse_args()
+
+    import app as flask_app
+    from pymongo import MongoClient
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    client.drop_database(args.db)
+    db = client[args.db]
+    # Point the module level collections the route uses at the throwaway database
+    flask_app.db = db
+    flask_app.flashcards = db["flashcards"]
+
+    card_id = db.flashcards.insert_one({"question": "What is osmosis?", "answer": "movement of water", "score": 0.8}).inserted_id
+    sent = {"correct": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        test_client = flask_app.app.test_client()
+        correct = 0
+        timings = []
+        for _ in range(args.answers):
+            right = rng.random() < 0.5
+            start = time.perf_counter()
+            response = test_client.post("/check_mastery_answer", json={
+                "card_id": str(card_id),
+                "user_answer": "movement of water" if right else "no idea"
+            })
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            correct += right
+        with lock:
+            sent["correct"] += correct
+            latencies.extend(timings)
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        card = db.flashcards.find_one({"_id": card_id})
+        expected = {
+            "attempts": args.threads * args.answers,
+            "correct_attempts": sent["correct"],
+            "xp": 10 * sent["correct"],
+        }
+        actual = {key: card.get(key) for key in expected}
+        print(f"expected {expected}")
+        print(f"actual   {actual}")
+        print(f"latency  p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+        if actual != expected:
+            print("FAIL: concurrent answers were lost")
+            sys.exit(1)
+        print("OK: no lost updates")
+    finally:
+        client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# card_api.py
+# JSON card API for the study, quiz and mastery pages. Cards are fetched a page at a time
+# as the user advances, with only the fields that view needs, instead of inlining the whole
+# set into the HTML.
+#
+#   GET /api/sets/<set_id>/cards?view=quiz&limit=50&after=<last card _id>&status=red
+#   GET /api/sets/<set_id>/due?view=mastery&limit=20
+#
+# Pages are ordered by _id and the cursor is the last _id of the previous page, so every
+# page is one index range scan on (set_id, user_id, _id) however deep into the set it is.
+# The due endpoint has no cursor: answering a card reschedules it, so asking again simply
+# returns whatever is due next (see scheduler.py).
+
+from flask import Blueprint, request, session, jsonify, current_app
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from card_cache import CARD_DEFAULTS
+from scheduler import DUE_BATCH_SIZE, due_cards
+
+card_api_bp = Blueprint("card_api", __name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# view -> the card fields its page script uses
+VIEW_FIELDS = {
+    "study": ["question", "answer"],
+    "quiz": ["question", "status"],
+    "mastery": ["question", "status", "mastery_score"],
+}
+
+STATUSES = ("red", "amber", "green")
+
+
+def set_summary(flashcards, set_id, user_id):
+    # Card total and per-status counts for one set, without fetching the cards
+    counts = {status: 0 for status in STATUSES}
+    mastered = 0
+    for row in flashcards.aggregate([
+        {"$match": {"set_id": ObjectId(set_id), "user_id": user_id}},
+        {"$group": {
+            "_id": {"$ifNull": ["$status", "red"]},
+            "count": {"$sum": 1},
+            "mastered": {"$sum": {"$cond": [
+                {"$or": [
+                    {"$eq": ["$status", "green"]},
+                    {"$gte": [{"$ifNull": ["$mastery_score", 0]}, 0.8]}
+                ]}, 1, 0
+            ]}}
+        }}
+    ]):
+        counts[row["_id"]] = counts.get(row["_id"], 0) + row["count"]
+        mastered += row["mastered"]
+    return {"total": sum(counts.values()), "counts": counts, "mastered": mastered}
+
+
+def _clean(card, fields):
+    clean = {"_id": str(card["_id"])}
+    for field in fields:
+        value = card.get(field)
+        clean[field] = CARD_DEFAULTS.get(field, "") if value is None else value
+    return clean
+
+
+def _parse_request(set_id, default_limit):
+    # Returns (set_oid, user_id, view, limit) or an error response for the route to return
+    if "user_id" not in session:
+        return None, (jsonify({"error": "Unauthorized"}), 401)
+
+    view = request.args.get("view", "study")
+    if view not in VIEW_FIELDS:
+        return None, (jsonify({"error": f"Unknown view, expected one of {sorted(VIEW_FIELDS)}"}), 400)
+
+    try:
+        set_oid = ObjectId(set_id)
+        limit = min(max(int(request.args.get("limit", default_limit)), 1), MAX_PAGE_SIZE)
+    except (InvalidId, TypeError, ValueError):
+        return None, (jsonify({"error": "Invalid set_id or limit"}), 400)
+
+    user_id = ObjectId(session["user_id"])
+    if not current_app.db["flashcardsets"].find_one({"_id": set_oid, "user_id": user_id}, {"_id": 1}):
+        return None, (jsonify({"error": "Set not found"}), 404)
+    return (set_oid, user_id, view, limit), None
+
+
+@card_api_bp.route("/api/sets/<set_id>/cards")
+def set_cards(set_id):
+    parsed, error = _parse_request(set_id, PAGE_SIZE)
+    if error:
+        return error
+    set_oid, user_id, view, limit = parsed
+
+    try:
+        after = request.args.get("after")
+        after = ObjectId(after) if after else None
+    except InvalidId:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    query = {"set_id": set_oid, "user_id": user_id}
+    if after:
+        query["_id"] = {"$gt": after}
+    status = request.args.get("status")
+    if status:
+        if status not in STATUSES:
+            return jsonify({"error": f"Unknown status, expected one of {list(STATUSES)}"}), 400
+        # Cards that were never answered have no status yet and count as red
+        query["status"] = {"$in": ["red", None]} if status == "red" else status
+
+    fields = VIEW_FIELDS[view]
+    # One extra card tells us whether there is another page
+    cards = list(current_app.db["flashcards"].find(query, {field: 1 for field in fields}).sort("_id", 1).limit(limit + 1))
+    has_more = len(cards) > limit
+    cards = [_clean(card, fields) for card in cards[:limit]]
+
+    return jsonify({
+        "cards": cards,
+        "next": cards[-1]["_id"] if has_more else None
+    })
+
+
+@card_api_bp.route("/api/sets/<set_id>/due")
+def due_set_cards(set_id):
+    parsed, error = _parse_request(set_id, DUE_BATCH_SIZE)
+    if error:
+        return error
+    set_oid, user_id, view, limit = parsed
+
+    fields = VIEW_FIELDS[view]
+    cards = due_cards(current_app.db["flashcards"], user_id, set_oid, {field: 1 for field in fields}, limit)
+    return jsonify({"cards": [_clean(card, fields) for card in cards]})
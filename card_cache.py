@@ -0,0 +1,133 @@
+# card_cache.py
+# In-process LRU of each set's cards, already converted to JSON-ready dicts (ObjectIds as
+# strings), so the view_set and mastery analytics pages skip fetching and converting the
+# whole set on repeat visits.
+#
+# Only what a card says is cached, never the progress fields an answer changes
+# (PROGRESS_FIELDS): answering doesn't touch the cache, and pages that show progress fetch
+# just those fields and merge them in (with_progress).
+#
+# Every other write to a set's cards must call invalidate(flashcards, set_id). That bumps a
+# cards_version counter on the set document, and get() reads it (one _id lookup) before using
+# a cached list, so an edit made through any web worker is seen by all of them. The version is
+# read before the cards are loaded, so a load racing with a write is tagged with the older
+# version and reloaded on the next read. CARD_CACHE_TTL_SECONDS is a safety net for writes
+# that skip invalidate().
+#
+# The cached lists are shared between requests: callers must not modify them.
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from bson import ObjectId
+
+CARD_CACHE_MAX_SETS = int(os.environ.get("CARD_CACHE_MAX_SETS", 256))
+CARD_CACHE_TTL_SECONDS = int(os.environ.get("CARD_CACHE_TTL_SECONDS", 300))
+
+CARD_DEFAULTS = {
+    "status": "red",
+    "mastery_score": 0,
+    "attempts": 0,
+    "xp": 0,
+    "current_streak": 0,
+    "visual_explanation": "",
+}
+
+
+# Written by mastery.record_answer(s) and the scheduler on every answer
+PROGRESS_FIELDS = ("status", "mastery_score", "attempts", "correct_attempts", "xp", "current_streak",
+                   "interval_days", "next_due")
+CONTENT_DEFAULTS = {key: value for key, value in CARD_DEFAULTS.items() if key not in PROGRESS_FIELDS}
+
+
+def serialize_card(card, defaults=CARD_DEFAULTS):
+    clean = {key: str(value) if isinstance(value, ObjectId) else value for key, value in card.items()}
+    for key, default in defaults.items():
+        if clean.get(key) is None:
+            clean[key] = default
+    return clean
+
+
+def with_progress(flashcards, set_id, cards):
+    # Copies of cached cards with their current progress fields (one projected query)
+    progress = {
+        str(card.pop("_id")): card
+        for card in flashcards.find({"set_id": ObjectId(set_id)}, {field: 1 for field in PROGRESS_FIELDS})
+    }
+    return [serialize_card({**card, **progress.get(card["_id"], {})}) for card in cards]
+
+
+class CardCache:
+    def __init__(self, max_sets=CARD_CACHE_MAX_SETS, ttl_seconds=CARD_CACHE_TTL_SECONDS):
+        self.max_sets = max_sets
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # set_id -> (cards, approx_bytes, cards_version, loaded_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _sets(flashcards):
+        return flashcards.database["flashcardsets"]
+
+    def _version(self, flashcards, set_id):
+        doc = self._sets(flashcards).find_one({"_id": ObjectId(set_id)}, {"cards_version": 1})
+        return doc.get("cards_version", 0) if doc else 0
+
+    def get(self, flashcards, set_id):
+        # The set's cards without their progress fields; see with_progress
+        key = str(set_id)
+        version = self._version(flashcards, set_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[2] != version or time.time() - entry[3] > self.ttl_seconds):
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry:
+            cards = entry[0]
+        else:
+            loaded_at = time.time()
+            cards = [
+                serialize_card(c, CONTENT_DEFAULTS)
+                for c in flashcards.find({"set_id": ObjectId(set_id)}, {field: 0 for field in PROGRESS_FIELDS})
+            ]
+            size = len(json.dumps(cards, default=str))
+            with self._lock:
+                self._entries[key] = (cards, size, version, loaded_at)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_sets:
+                    self._entries.popitem(last=False)
+        return cards
+
+    def invalidate(self, flashcards, set_id):
+        if set_id is None:
+            return
+        self._sets(flashcards).update_one({"_id": ObjectId(str(set_id))}, {"$inc": {"cards_version": 1}})
+        with self._lock:
+            self._entries.pop(str(set_id), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sets": len(self._entries),
+                "max_sets": self.max_sets,
+                "ttl_seconds": self.ttl_seconds,
+                "cards": sum(len(entry[0]) for entry in self._entries.values()),
+                "approx_bytes": sum(entry[1] for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+card_cache = CardCache()
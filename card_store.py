@@ -0,0 +1,52 @@
+# card_store.py
+# Single write path for flashcards: cards go in with batched insert_many, and a new set plus
+# its cards are written in one transaction when the server supports transactions.
+# Manual card creation, saving generated decks and any importer should all come through here.
+
+import os
+import time
+
+CARD_BATCH_SIZE = int(os.environ.get("CARD_BATCH_SIZE", 500))
+
+_transaction_support = {}
+
+
+def supports_transactions(client):
+    # Transactions need a replica set member or a mongos; a standalone server rejects them
+    key = id(client)
+    if key not in _transaction_support:
+        try:
+            hello = client.admin.command("hello")
+            _transaction_support[key] = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transaction_support[key] = False
+    return _transaction_support[key]
+
+
+def _write(db, cards, set_doc, batch_size, session=None):
+    set_id = None
+    if set_doc is not None:
+        set_id = db["flashcardsets"].insert_one(set_doc, session=session).inserted_id
+        for card in cards:
+            card["set_id"] = set_id
+
+    timings = []
+    for i in range(0, len(cards), batch_size):
+        start = time.perf_counter()
+        db["flashcards"].insert_many(cards[i:i + batch_size], session=session)
+        timings.append(round((time.perf_counter() - start) * 1000, 1))
+
+    if timings:
+        print(f"Saved {len(cards)} cards in {len(timings)} batch(es) of up to {batch_size}: {timings} ms")
+    return set_id
+
+
+def save_cards(db, cards, set_doc=None, batch_size=None):
+    # Returns the new set's id when set_doc is given, otherwise None
+    batch_size = batch_size or CARD_BATCH_SIZE
+    client = db.client
+
+    if supports_transactions(client):
+        with client.start_session() as session:
+            return session.with_transaction(lambda s: _write(db, cards, set_doc, batch_size, session=s))
+    return _write(db, cards, set_doc, batch_size)
@@ -0,0 +1,86 @@
+# dedupe.py
+# Near-duplicate card detection. Lecture packs repeat the same definition with small wording
+# changes, so besides exact question matches a card is dropped when its answer is nearly the
+# same as one already kept.
+#
+# Comparing every pair would be quadratic, so answers are MinHashed over word shingles and
+# bucketed with LSH (BANDS bands of ROWS hashes): only cards sharing a bucket are compared,
+# and rapidfuzz confirms each candidate. Cost is linear in the number of cards plus the
+# (small) number of candidate pairs.
+
+import os
+import re
+import random
+import zlib
+
+from rapidfuzz import fuzz
+
+# Minimum fuzz.ratio between normalized answers for two cards to count as duplicates
+DUPLICATE_THRESHOLD = int(os.environ.get("DUPLICATE_THRESHOLD", 90))
+SHINGLE_WORDS = 2
+BANDS = 8
+ROWS = 3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def _shingle_hashes(words):
+    if len(words) < SHINGLE_WORDS:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return {zlib.crc32(s.encode("utf-8")) for s in shingles}
+
+
+def _minhash(hashes):
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._answers = []
+        self._questions = set()
+        self._buckets = {}  # (band, band hashes) -> indices into _answers
+
+    def _bands(self, answer):
+        signature = _minhash(_shingle_hashes(answer.split()))
+        return [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+    def is_duplicate(self, card, add=True):
+        # True when card matches one already indexed; otherwise it is indexed (unless add=False)
+        question = _normalize(card.get("question"))
+        answer = _normalize(card.get("answer"))
+        if question and question in self._questions:
+            return True
+
+        bands = self._bands(answer) if answer else []
+        checked = set()
+        for key in bands:
+            for i in self._buckets.get(key, ()):
+                if i not in checked:
+                    checked.add(i)
+                    if fuzz.ratio(answer, self._answers[i]) >= self.threshold:
+                        return True
+
+        if add:
+            self._questions.add(question)
+            index = len(self._answers)
+            self._answers.append(answer)
+            for key in bands:
+                self._buckets.setdefault(key, []).append(index)
+        return False
+
+
+def dedupe_cards(cards, existing=()):
+    # Keeps the first card of each near-duplicate group, and drops any that match `existing`
+    index = NearDuplicateIndex()
+    for card in existing:
+        index.is_duplicate(card)
+    return [card for card in cards if not index.is_duplicate(card)]
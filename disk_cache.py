@@ -0,0 +1,119 @@
+# disk_cache.py
+# Small persistent key -> text cache on local disk, evicted by total size and age.
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes, max_age_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        # Keys are hashes, but never trust them as file names
+        safe_key = "".join(ch for ch in key if ch.isalnum() or ch in "-_.")
+        return os.path.join(self.directory, safe_key + ".txt")
+
+    def reader(self, key):
+        # The entry as an open text file, for reading a big entry a line at a time; None on a miss
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            f = open(path, "r", encoding="utf-8")
+            # mtime doubles as "last used", so eviction drops the least recently used first
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return f
+
+    def get(self, key):
+        f = self.reader(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put(self, key, value):
+        with self.writer(key) as f:
+            f.write(value)
+
+    @contextmanager
+    def writer(self, key):
+        # Streams an entry to a temp file that replaces the entry only when the block completes
+        # (an exception or a closed generator leaves the cache as it was). Nothing written, no entry
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # Unique name: several writers may be filling the same key at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                yield f
+                written = f.tell() > 0
+            if written:
+                # Atomic swap, so readers in other workers never see a half written entry
+                os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".txt"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self):
+        with self._lock:
+            now = time.time()
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    self.evictions += 1
+                except OSError:
+                    pass
+                total -= size
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
@@ -0,0 +1,168 @@
+# document_model.py
+# Every upload is parsed once into a Document: its sections in reading order, each with a title
+# (a slide title or a .docx heading; "" where the format has none) and a body. PDFs give one
+# section per page. Long bodies are cut into windows of LINES_PER_BLOCK lines, so a section is
+# always a reasonable unit to stream. The card heuristics in nlp.py only ever look at sections.
+#
+# Documents round-trip through JSON lines (to_json/from_json): a header with the page count,
+# then one line per section. That is what the extraction cache stores, so a cached upload is
+# never opened again, and it can be written and read a section at a time (dump_header,
+# dump_section, read_header, load_sections), so a very large document is never held whole.
+# The page count means the page limit needs no extra pass over the file either. The functions
+# below take the PdfReader the caller already has, so a PDF is opened once per parse.
+
+import os
+import re
+import json
+import zipfile
+
+import lazy_deps
+import ocr
+from parallel_extract import extract_pdf_pages, extract_pptx_sections, iter_pdf_pages, iter_pptx_sections
+
+LINES_PER_BLOCK = 200
+# Used to estimate the page count of plain text
+CHARS_PER_PAGE = 3000
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+
+
+class Section:
+    def __init__(self, title="", body=""):
+        self.title = title
+        self.body = body
+
+    def text(self):
+        return "\n".join(part for part in (self.title, self.body) if part)
+
+    def to_dict(self):
+        return {"title": self.title, "body": self.body}
+
+
+class Document:
+    def __init__(self, sections=None, pages=None):
+        self.sections = sections or []
+        # Pages (slides) in the source file; None where that isn't known (.docx)
+        self.pages = pages
+
+    def text(self):
+        return "\n".join(section.text() for section in self.sections)
+
+    def is_empty(self):
+        return not any(section.text().strip() for section in self.sections)
+
+    def to_json(self):
+        return dump_header(self.pages) + "".join(dump_section(section) for section in self.sections)
+
+    @classmethod
+    def from_json(cls, data):
+        lines = data.split("\n")
+        return cls(list(load_sections(lines[1:])), json.loads(lines[0])["pages"])
+
+
+def dump_header(pages):
+    return json.dumps({"pages": pages}) + "\n"
+
+
+def dump_section(section):
+    # JSON escapes newlines, so a section is always exactly one line
+    return json.dumps(section.to_dict(), ensure_ascii=False) + "\n"
+
+
+def read_header(lines):
+    # The page count from the first line of a JSON lines document (an open file, say)
+    return json.loads(next(iter(lines)))["pages"]
+
+
+def load_sections(lines):
+    for line in lines:
+        if line.strip():
+            data = json.loads(line)
+            yield Section(data["title"], data["body"])
+
+
+def _windows(lines, title=""):
+    # Sections of at most LINES_PER_BLOCK lines; the first one carries the title
+    window = []
+    for line in lines:
+        window.append(line)
+        if len(window) == LINES_PER_BLOCK:
+            yield Section(title, "\n".join(window))
+            title, window = "", []
+    if window or title:
+        yield Section(title, "\n".join(window))
+
+
+def _is_heading(paragraph):
+    style = paragraph.style.name if paragraph.style is not None else ""
+    return style == "Title" or style.startswith("Heading")
+
+
+def _docx_sections(filepath):
+    title, lines = "", []
+    for paragraph in lazy_deps.load("docx").Document(filepath).paragraphs:
+        if _is_heading(paragraph) and paragraph.text.strip():
+            yield from _windows(lines, title)
+            title, lines = paragraph.text.strip(), []
+        else:
+            lines.append(paragraph.text)
+    yield from _windows(lines, title)
+
+
+def _txt_sections(filepath):
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        yield from _windows(line.rstrip("\n") for line in f)
+
+
+def pdf_reader(filepath):
+    return lazy_deps.load("PyPDF2").PdfReader(filepath)
+
+
+def iter_sections(filepath, reader=None):
+    # Yields the sections as the file is read, without ever holding the whole document. Big PDFs
+    # and slide decks are extracted on the process pool a range of pages at a time
+    ext = os.path.splitext(filepath)[1].lower()
+    try:
+        if ext == ".pdf":
+            yield from (Section(body=text) for text in iter_pdf_pages(filepath, reader=reader))
+        elif ext == ".pptx":
+            yield from (Section(title, body) for title, body in iter_pptx_sections(filepath, page_count(filepath)))
+        elif ext == ".docx":
+            yield from _docx_sections(filepath)
+        elif ext == ".txt":
+            yield from _txt_sections(filepath)
+        elif ext in IMAGE_EXTENSIONS:
+            yield Section(body=ocr.image_file_text(filepath))
+    except Exception as e:
+        print(f"Extraction Error: {e}")
+
+
+def parse(filepath, reader=None, pages=None):
+    # The whole Document; big PDFs and slide decks are extracted on the process pool
+    ext = os.path.splitext(filepath)[1].lower()
+    try:
+        if ext == ".pdf":
+            texts = extract_pdf_pages(filepath, reader=reader)
+            return Document([Section(body=text) for text in texts], len(texts))
+        if ext == ".pptx":
+            sections = [Section(title, body) for title, body in extract_pptx_sections(filepath)]
+            return Document(sections, len(sections))
+    except Exception as e:
+        print(f"Extraction Error: {e}")
+        return Document()
+    return Document(list(iter_sections(filepath)), pages)
+
+
+def page_count(filepath, reader=None):
+    # Pages (slides) without extracting any text; None when it can't be had cheaply (.docx).
+    # Raises if the file can't be read
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".pdf":
+        return len((reader or pdf_reader(filepath)).pages)
+    if ext == ".pptx":
+        with zipfile.ZipFile(filepath) as z:
+            return sum(1 for name in z.namelist() if re.match(r'ppt/slides/slide\d+\.xml$', name))
+    if ext == ".txt":
+        return -(-os.path.getsize(filepath) // CHARS_PER_PAGE)
+    if ext in IMAGE_EXTENSIONS:
+        return 1
+    return None
@@ -0,0 +1,46 @@
+# drafts.py
+# Server-side store for generated decks that are waiting to be reviewed and saved.
+# Only the opaque draft id lives in the session cookie; the cards stay in MongoDB.
+
+import os
+import secrets
+from datetime import datetime, timedelta
+
+# Expiry is enforced by the TTL index on expires_at declared in indexes.py
+DRAFT_TTL_HOURS = int(os.environ.get("DRAFT_TTL_HOURS", 24))
+
+
+def create_draft(db, user_id, cards, filename, language, complete=True):
+    # complete=False for a streamed deck whose cards are still being generated
+    now = datetime.utcnow()
+    draft_id = secrets.token_urlsafe(16)
+    db["drafts"].insert_one({
+        "_id": draft_id,
+        "user_id": user_id,
+        "cards": cards,
+        "filename": filename,
+        "language": language,
+        "complete": complete,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=DRAFT_TTL_HOURS)
+    })
+    return draft_id
+
+
+def get_draft(db, draft_id, user_id):
+    if not draft_id:
+        return None
+    # The TTL monitor only runs about once a minute, so filter out expired drafts here too
+    return db["drafts"].find_one({
+        "_id": draft_id,
+        "user_id": user_id,
+        "expires_at": {"$gt": datetime.utcnow()}
+    })
+
+
+def set_cards(db, draft_id, user_id, cards):
+    db["drafts"].update_one({"_id": draft_id, "user_id": user_id}, {"$set": {"cards": cards, "complete": True}})
+
+
+def delete_draft(db, draft_id, user_id):
+    db["drafts"].delete_one({"_id": draft_id, "user_id": user_id})
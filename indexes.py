@@ -0,0 +1,114 @@
+# indexes.py
+# Every index the app's queries rely on, plus a check that each route's query shape is served by one.
+#
+#   python indexes.py ensure     # create missing indexes (also done at app startup)
+#   python indexes.py check      # explain() every query shape, exit 1 if any is a COLLSCAN
+
+import os
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "users": [
+        ([("username", ASCENDING)], {"unique": True}),
+    ],
+    "flashcardsets": [
+        ([("user_id", ASCENDING)], {}),
+    ],
+    "flashcards": [
+        # set_id first, so queries on set_id alone can use it too; _id last so the card API's
+        # cursor pages are a range scan that comes out already sorted
+        ([("set_id", ASCENDING), ("user_id", ASCENDING), ("_id", ASCENDING)], {}),
+        # Due cards for mastery and quiz sessions (scheduler.due_cards)
+        ([("user_id", ASCENDING), ("set_id", ASCENDING), ("next_due", ASCENDING)], {}),
+    ],
+    "progress": [
+        ([("user_id", ASCENDING), ("set_id", ASCENDING)], {}),
+        # view_sets looks progress up by set only
+        ([("set_id", ASCENDING)], {}),
+    ],
+    "uploads": [
+        # upload_store.prune looks for objects by when they were last used
+        ([("last_used", ASCENDING)], {}),
+    ],
+    "drafts": [
+        # MongoDB deletes a draft once expires_at has passed
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+_SAMPLE_ID = ObjectId("000000000000000000000000")
+
+# (route, collection, filter) for every query shape the routes run
+QUERY_SHAPES = [
+    ("login / signup", "users", {"username": "sample"}),
+    ("dashboard, create_flashcard, view_sets", "flashcardsets", {"user_id": _SAMPLE_ID}),
+    ("study, quiz, mastery", "flashcards", {"set_id": _SAMPLE_ID, "user_id": _SAMPLE_ID}),
+    ("view_set, mastery analytics, view_sets $lookup", "flashcards", {"set_id": _SAMPLE_ID}),
+    ("card API pages", "flashcards", {"set_id": _SAMPLE_ID, "user_id": _SAMPLE_ID, "_id": {"$gt": _SAMPLE_ID}}),
+    ("due cards", "flashcards", {"user_id": _SAMPLE_ID, "set_id": _SAMPLE_ID, "next_due": {"$lte": datetime(2000, 1, 1)}}),
+    ("new cards", "flashcards", {"user_id": _SAMPLE_ID, "set_id": _SAMPLE_ID, "next_due": None}),
+    ("update_progress", "progress", {"user_id": _SAMPLE_ID, "set_id": _SAMPLE_ID}),
+    ("get_progress", "progress", {"user_id": _SAMPLE_ID}),
+    ("view_sets $lookup", "progress", {"set_id": _SAMPLE_ID}),
+]
+
+
+def ensure_indexes(db):
+    # A failing index (e.g. duplicate usernames blocking the unique one) doesn't stop the others
+    ok = True
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except ServerSelectionTimeoutError as e:
+                # No point waiting out the timeout once per index
+                print(f"Could not reach MongoDB to create indexes: {e}")
+                return False
+            except PyMongoError as e:
+                ok = False
+                print(f"Could not create index {keys} on {collection}: {e}")
+    return ok
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans(db):
+    # Returns the (route, collection, filter) shapes whose winning plan scans the whole collection
+    failures = []
+    for route, collection, query in QUERY_SHAPES:
+        plan = db[collection].find(query).explain()["queryPlanner"]["winningPlan"]
+        stages = set(_stages(plan))
+        print(f"{'COLLSCAN' if 'COLLSCAN' in stages else 'ok':8} {collection:14} {route:50} {sorted(stages)}")
+        if "COLLSCAN" in stages:
+            failures.append((route, collection, query))
+    return failures
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    db = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))["flashcarddb"]
+    if command == "ensure":
+        sys.exit(0 if ensure_indexes(db) else 1)
+    elif command == "check":
+        sys.exit(1 if check_query_plans(db) else 0)
+    else:
+        print("usage: python indexes.py [ensure|check]")
+        sys.exit(2)
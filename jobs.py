@@ -0,0 +1,165 @@
+# jobs.py
+# Runs flashcard generation on a bounded process pool so uploads don't tie up request threads.
+# Each job reports its peak RSS (see memory_budget.py), in its status and on /metrics.
+
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import memory_budget
+import metrics
+from nlp import generate_flashcards_from_file
+
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", 2))
+MAX_PENDING_JOBS = int(os.environ.get("MAX_PENDING_JOBS", 20))
+JOB_TTL_SECONDS = 30 * 60
+
+# Order matters: the position of a stage is used to work out the progress percentage
+STAGES = ["queued", "extracting", "generating", "translating", "rendering", "done"]
+
+_pool = None
+_manager = None
+_stages = None  # shared dict job_id -> stage, written to by the worker processes
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _get_pool():
+    # Created on first upload so importing the app doesn't spawn processes
+    global _pool, _manager, _stages
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+        _stages = _manager.dict()
+    if _pool is None:
+        # Forked workers start with a copy of this process's metrics; drop it so nothing is counted twice
+        _pool = ProcessPoolExecutor(max_workers=GENERATION_WORKERS, initializer=metrics.drain)
+    return _pool
+
+
+def _restart_pool():
+    global _pool
+    _pool.shutdown(wait=False)
+    _pool = None
+
+
+# ---------------- Worker (runs in a child process) ----------------
+def _run_generation(job_id, filepath, language, engine, stages, content_hash):
+    def report(stage):
+        stages[job_id] = stage
+    # A worker runs one job at a time, so after a reset the high-water mark is this job's
+    memory_budget.reset_peak_rss()
+    try:
+        cards = generate_flashcards_from_file(filepath, language=language, progress=report, engine=engine,
+                                              content_hash=content_hash)
+    finally:
+        peak = memory_budget.peak_rss_mb()
+        metrics.observe("generation_job_peak_rss_megabytes", peak)
+        print(f"Job {job_id}: peak RSS {peak:.0f} MB")
+    # The worker's metrics travel back with the cards so /metrics in the web process sees them
+    return cards, metrics.drain(), round(peak, 1)
+
+
+def _job_finished(future):
+    if future.exception():
+        metrics.inc("generation_jobs_total", outcome="failed")
+        return
+    metrics.inc("generation_jobs_total", outcome="done")
+    metrics.merge(future.result()[1])
+
+
+# ---------------- Job API ----------------
+def _prune():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id, job in list(_jobs.items()):
+        if job["created"] < cutoff and job["future"].done():
+            _jobs.pop(job_id, None)
+            if _stages is not None:
+                _stages.pop(job_id, None)
+
+
+def submit_generation(filepath, language, user_id, filename, engine="heuristic", upload=None, content_hash=None):
+    # Returns the new job id, or None when too many jobs are already waiting.
+    # upload is the upload_store name the job holds a reference to, for the caller to release
+    with _lock:
+        pool = _get_pool()
+        _prune()
+        pending = sum(1 for job in _jobs.values() if not job["future"].done())
+        if pending >= MAX_PENDING_JOBS:
+            return None
+
+        job_id = uuid.uuid4().hex
+        _stages[job_id] = "queued"
+        args = (_run_generation, job_id, filepath, language, engine, _stages, content_hash)
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            # A worker died abruptly (e.g. OOM-killed), which breaks the whole pool; start a new one
+            print("Generation pool is broken, restarting it")
+            _restart_pool()
+            future = _get_pool().submit(*args)
+        _jobs[job_id] = {
+            "user_id": user_id,
+            "filename": filename,
+            "language": language,
+            "upload": upload,
+            "created": time.time(),
+            "future": future,
+        }
+        future.add_done_callback(_job_finished)
+    return job_id
+
+
+def _get_job(job_id, user_id):
+    job = _jobs.get(job_id)
+    if not job or job["user_id"] != user_id:
+        return None
+    return job
+
+
+def job_upload(job_id, user_id):
+    job = _get_job(job_id, user_id)
+    return job["upload"] if job else None
+
+
+def job_status(job_id, user_id):
+    job = _get_job(job_id, user_id)
+    if not job:
+        return None
+
+    future = job["future"]
+    stage = _stages.get(job_id, "queued") if _stages is not None else "queued"
+    if future.done():
+        state = "failed" if future.exception() else "done"
+        stage = "done"
+    else:
+        state = "running" if stage != "queued" else "queued"
+
+    status = {
+        "job_id": job_id,
+        "state": state,
+        "stage": stage,
+        "progress": int(STAGES.index(stage) / (len(STAGES) - 1) * 100),
+    }
+    if state == "failed":
+        status["error"] = str(future.exception())
+    elif state == "done":
+        status["peak_rss_mb"] = future.result()[2]
+    return status
+
+
+def pop_result(job_id, user_id):
+    # Hands back (cards, filename, language) once and forgets the job; cards is None if it failed.
+    # Concurrent callers race for the job, and all but one get None
+    with _lock:
+        job = _get_job(job_id, user_id)
+        if not job or not job["future"].done():
+            return None
+        _jobs.pop(job_id, None)
+        if _stages is not None:
+            _stages.pop(job_id, None)
+    cards = None if job["future"].exception() else job["future"].result()[0]
+    return cards, job["filename"], job["language"]
@@ -0,0 +1,44 @@
+# lazy_deps.py
+# Heavy libraries are imported the first time an extractor needs them instead of at app start,
+# so quiz traffic and worker respawns don't pay for spaCy, tesseract, PDF/Office parsers etc.
+
+import sys
+import time
+import importlib
+import threading
+
+# Modules that should stay unloaded until something actually needs them
+HEAVY_MODULES = ["spacy", "docx", "pptx", "PyPDF2", "pytesseract", "tesserocr", "PIL", "deep_translator"]
+
+_load_times = {}  # name -> seconds spent loading it in this process
+_lock = threading.Lock()
+
+
+def load(module_name):
+    module = sys.modules.get(module_name)
+    if module is not None and module_name in _load_times:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _load_times.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+
+def record(name, seconds):
+    # For things that aren't modules, e.g. the spaCy model
+    _load_times[name] = seconds
+
+
+def _loaded_lazily(name):
+    # Loading "PIL.Image" counts as loading "PIL"
+    return any(key == name or key.startswith(name + ".") for key in _load_times)
+
+
+def report():
+    return {
+        "loaded": {name: round(seconds * 1000, 1) for name, seconds in _load_times.items()},
+        # Anything listed here was imported eagerly somewhere, bypassing load()
+        "imported_eagerly": [name for name in HEAVY_MODULES if name in sys.modules and not _loaded_lazily(name)],
+        "not_loaded": [name for name in HEAVY_MODULES if name not in sys.modules],
+    }
@@ -0,0 +1,62 @@
+# mastery.py
+# Mastery bookkeeping done by MongoDB itself: one update pipeline bumps the counters and
+# recomputes mastery_score and status from the stored values, so concurrent answers
+# (two tabs, batch syncs) can't overwrite each other's progress.
+
+from pymongo import ReturnDocument, UpdateOne
+
+from scheduler import schedule_stages
+
+XP_PER_CORRECT = 10
+RESULT_FIELDS = {"set_id": 1, "attempts": 1, "correct_attempts": 1, "mastery_score": 1,
+                 "status": 1, "current_streak": 1, "xp": 1, "next_due": 1}
+
+
+def mastery_update(is_correct):
+    hit = 1 if is_correct else 0
+    return [
+        {"$set": {
+            "attempts": {"$add": [{"$ifNull": ["$attempts", 0]}, 1]},
+            "correct_attempts": {"$add": [{"$ifNull": ["$correct_attempts", 0]}, hit]},
+            "current_streak": {"$add": [{"$ifNull": ["$current_streak", 0]}, 1]} if is_correct else {"$literal": 0},
+            "xp": {"$add": [{"$ifNull": ["$xp", 0]}, XP_PER_CORRECT * hit]},
+        }},
+        # Mastery Calculation: 40% AI confidence (the generation score), 60% user accuracy
+        {"$set": {
+            "mastery_score": {"$round": [{"$add": [
+                {"$multiply": [0.4, {"$ifNull": ["$score", 0.7]}]},
+                {"$multiply": [0.6, {"$divide": ["$correct_attempts", "$attempts"]}]}
+            ]}, 2]}
+        }},
+        {"$set": {
+            "status": {"$switch": {
+                "branches": [
+                    {"case": {"$gte": ["$mastery_score", 0.8]}, "then": "green"},
+                    {"case": {"$gte": ["$mastery_score", 0.5]}, "then": "amber"},
+                ],
+                "default": "red"
+            }}
+        }},
+        # ...and when the card is next due
+        *schedule_stages(is_correct),
+    ]
+
+
+def record_answer(flashcards, card_id, is_correct):
+    # Returns the card's counters after the update, or None if the card doesn't exist
+    return flashcards.find_one_and_update(
+        {"_id": card_id},
+        mastery_update(is_correct),
+        projection=RESULT_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def record_answers(flashcards, graded):
+    # graded is a list of (card_id, is_correct); all updates go in one ordered bulk_write so
+    # repeated answers to the same card are applied in the order they were given
+    if not graded:
+        return {}
+    flashcards.bulk_write([UpdateOne({"_id": card_id}, mastery_update(ok)) for card_id, ok in graded], ordered=True)
+    card_ids = list({card_id for card_id, _ in graded})
+    return {card["_id"]: card for card in flashcards.find({"_id": {"$in": card_ids}}, RESULT_FIELDS)}
@@ -0,0 +1,81 @@
+# memory_budget.py
+# Limits for very large documents. Past BOUNDED_MEMORY_PAGES pages, generation switches to the
+# bounded-memory mode in nlp.py: the document is read a page (or a window of lines) at a time
+# and never joined into one string. Between pages, check() compares the process's RSS with
+# MEMORY_BUDGET_MB. Documents longer than MAX_DOCUMENT_PAGES are refused up front.
+#
+# Peak RSS comes from VmHWM in /proc/self/status. Linux lets a process reset it (clear_refs),
+# so each generation job gets its own peak. Elsewhere the numbers cover the process's lifetime.
+
+import gc
+import os
+import sys
+import resource
+
+MEMORY_BUDGET_MB = int(os.environ.get("MEMORY_BUDGET_MB", 1024))  # 0 turns the check off
+MAX_DOCUMENT_PAGES = int(os.environ.get("MAX_DOCUMENT_PAGES", 1500))
+BOUNDED_MEMORY_PAGES = int(os.environ.get("BOUNDED_MEMORY_PAGES", 200))
+# Forces the bounded mode for every document
+BOUNDED_MEMORY = os.environ.get("BOUNDED_MEMORY", "false").lower() == "true"
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    # Returns False where the high-water mark can't be reset
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    peak = _status_mb("VmHWM:")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rss_mb():
+    current = _status_mb("VmRSS:")
+    return current if current is not None else peak_rss_mb()
+
+
+def use_bounded_mode(pages):
+    return BOUNDED_MEMORY or (pages is not None and pages > BOUNDED_MEMORY_PAGES)
+
+
+def check_pages(pages):
+    if pages is not None and pages > MAX_DOCUMENT_PAGES:
+        raise DocumentTooLarge(f"Document has {pages} pages, the limit is {MAX_DOCUMENT_PAGES}")
+
+
+def check():
+    # Raises MemoryBudgetExceeded when this process is over budget even after a collection
+    if not MEMORY_BUDGET_MB or rss_mb() <= MEMORY_BUDGET_MB:
+        return
+    gc.collect()
+    used = rss_mb()
+    if used > MEMORY_BUDGET_MB:
+        raise MemoryBudgetExceeded(f"Generation stopped: using {used:.0f} MB, the budget is {MEMORY_BUDGET_MB} MB")
@@ -0,0 +1,255 @@
+# metrics.py
+# Lightweight counters and timing histograms for the generation pipeline, the routes and the
+# MongoDB calls, exposed in the Prometheus text format on /metrics.
+#
+#   with metrics.timed("generation_stage_seconds", stage="extract"):
+#       ...
+#   metrics.inc("extraction_cache_total", result="hit")
+#
+# Values live in the process that recorded them. Generation runs in the job worker processes,
+# so jobs.py ships each worker's samples back with the result (drain/merge).
+#
+# Opt-in profiling: with PROFILE_SAMPLE_RATE > 0 that fraction of requests runs under cProfile,
+# and the PROFILE_KEEP slowest are dumped to PROFILE_DIR (and listed on /metrics/slowest).
+
+import os
+import time
+import random
+import bisect
+import heapq
+import cProfile
+import pstats
+import io
+import threading
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Histograms of something other than seconds
+CUSTOM_BUCKETS = {
+    "generation_job_peak_rss_megabytes": (64, 128, 256, 512, 768, 1024, 1536, 2048, 4096),
+}
+
+# name -> (type, help)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "Time spent handling a request, by endpoint"),
+    "http_requests_total": ("counter", "Requests handled, by endpoint and status"),
+    "mongodb_command_duration_seconds": ("histogram", "MongoDB command round trips, by command and collection"),
+    "mongodb_command_failures_total": ("counter", "MongoDB commands that failed"),
+    "generation_stage_seconds": ("histogram", "Time spent in each flashcard generation stage"),
+    "generation_jobs_total": ("counter", "Background generation jobs, by outcome"),
+    "cards_generated_total": ("counter", "Flashcards produced, by generator"),
+    "extraction_seconds": ("histogram", "Uncached text extraction, by file type"),
+    "extraction_cache_total": ("counter", "Extracted text cache lookups"),
+    "ocr_pages_total": ("counter", "Images sent to OCR, by result (recognised, cached, failed)"),
+    "translation_batch_seconds": ("histogram", "Translation backend calls"),
+    "translation_strings_total": ("counter", "Strings sent for translation, by cache result"),
+    "visual_render_seconds": ("histogram", "Drawing one visual explanation image"),
+    "generation_job_peak_rss_megabytes": ("histogram", "Peak resident memory of each generation job"),
+}
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 10))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "cache/profiles")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count], sum
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def _buckets(name):
+    return CUSTOM_BUCKETS.get(name, BUCKETS)
+
+
+def observe(name, value, **labels):
+    key = (name, _labels(labels))
+    buckets = _buckets(name)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(buckets, value)] += 1
+        entry[1] += value
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+# ---------------- Moving samples between processes ----------------
+def drain():
+    # Returns everything recorded in this process since the last drain and resets it
+    global _counters, _histograms
+    with _lock:
+        snapshot = (_counters, _histograms)
+        _counters, _histograms = {}, {}
+    return snapshot
+
+
+def merge(snapshot):
+    counters, histograms = snapshot
+    with _lock:
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, (buckets, total) in histograms.items():
+            entry = _histograms.setdefault(key, [[0] * (len(_buckets(key[0])) + 1), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+
+
+# ---------------- Prometheus text format ----------------
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(b), s) for key, (b, s) in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), (buckets, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(_buckets(name)) + ["+Inf"], buckets):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- MongoDB ----------------
+class MongoMetrics(monitoring.CommandListener):
+    # Pass to MongoClient(event_listeners=[...]) to time every command the client sends
+    def __init__(self):
+        self._collections = {}
+        self._collections_lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        with self._collections_lock:
+            self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def _collection(self, event):
+        with self._collections_lock:
+            return self._collections.pop(event.request_id, "")
+
+    def succeeded(self, event):
+        observe("mongodb_command_duration_seconds", event.duration_micros / 1e6,
+                command=event.command_name, collection=self._collection(event))
+
+    def failed(self, event):
+        collection = self._collection(event)
+        observe("mongodb_command_duration_seconds", event.duration_micros / 1e6,
+                command=event.command_name, collection=collection)
+        inc("mongodb_command_failures_total", command=event.command_name, collection=collection)
+
+
+# ---------------- Sampling profiler ----------------
+_slowest = []  # min-heap of (seconds, sequence, summary) so the fastest kept profile is dropped first
+_sequence = 0
+
+
+def _keep_profile(profiler, seconds, label):
+    global _sequence
+    with _lock:
+        _sequence += 1
+        if len(_slowest) >= PROFILE_KEEP and seconds <= _slowest[0][0]:
+            return
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{_sequence}.txt")
+        entry = (seconds, _sequence, {"request": label, "seconds": round(seconds, 4), "profile": path})
+        if len(_slowest) >= PROFILE_KEEP:
+            _, _, dropped = heapq.heapreplace(_slowest, entry)
+            try:
+                os.remove(dropped["profile"])
+            except OSError:
+                pass
+        else:
+            heapq.heappush(_slowest, entry)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{label} took {seconds:.3f}s\n\n{out.getvalue()}")
+
+
+def slowest_requests():
+    with _lock:
+        return [summary for _, _, summary in sorted(_slowest, reverse=True)]
+
+
+# ---------------- Flask ----------------
+def init_app(app):
+    from flask import g, request, Response, jsonify, session
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profiler = None
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.metrics_profiler = profiler
+            except ValueError:
+                # Another profiler is already running in this process
+                pass
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        observe("http_request_duration_seconds", seconds, endpoint=endpoint, method=request.method)
+        inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _keep_profile(profiler, seconds, f"{request.method} {request.path}")
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/metrics/slowest")
+    def slowest_endpoint():
+        if "user_id" not in session:
+            return jsonify({"error": "Unauthorized"}), 401
+        return jsonify({"sample_rate": PROFILE_SAMPLE_RATE, "requests": slowest_requests()})
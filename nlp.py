@@ -1,39 +1,55 @@
 import re
 import random
 import os
-import spacy
-from docx import Document
-from PyPDF2 import PdfReader
-from pptx import Presentation
-import pytesseract
-from rapidfuzz import fuzz
-from PIL import Image, ImageDraw, ImageFont
+import time
+from rapidfuzz import fuzz, process
 import textwrap
-from deep_translator import GoogleTranslator  
+import lazy_deps
+import document_model
+import memory_budget
+import metrics
+import visuals
+from disk_cache import DiskCache, file_sha256
+from document_model import Document
+from translation import translate, translate_many
+from dedupe import NearDuplicateIndex, dedupe_cards
 
-# LOAD SPACY
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# LOAD SPACY (lazily, the first time a caller needs it)
+SPACY_MODEL = "en_core_web_sm"
+_spacy_model = None
+
+def get_spacy_model():
+    global _spacy_model
+    if _spacy_model is None:
+        spacy = lazy_deps.load("spacy")
+        start = time.perf_counter()
+        try:
+            _spacy_model = spacy.load(SPACY_MODEL)
+        except OSError:
+            raise RuntimeError(f"spaCy model '{SPACY_MODEL}' is not installed, run: python -m spacy download {SPACY_MODEL}")
+        lazy_deps.record(f"spacy:{SPACY_MODEL}", time.perf_counter() - start)
+    return _spacy_model
 
 # CONSTANTS
 EXACT_JUNK = {'this', 'that', 'it', 'they', 'there', 'what', 'which', 'who', 'example', 'examples'}
 URL_PATTERN = r'(https?://\S+|www\.\S+|\S+\.com/\S+|\S+\.be/\S+)'
 PREFIX_JUNK = r'^(e\.g\.|i\.e\.|etc|example:|note:)\s+'
-MAX_VISUALS = 3
+MAX_VISUALS = int(os.environ.get("MAX_VISUALS", 10))
+
+# Bump EXTRACTOR_VERSION whenever extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 5
+text_cache = DiskCache(
+    os.environ.get("TEXT_CACHE_DIR", "cache/extracted_text"),
+    max_bytes=int(os.environ.get("TEXT_CACHE_MAX_MB", 200)) * 1024 * 1024,
+    max_age_seconds=int(os.environ.get("TEXT_CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600
+)
 
 # --- NEW TRANSLATION HELPER ---
 def translate_if_needed(text, target_lang):
+    # Single string convenience wrapper; card generation batches through translate_many instead
     if not text or target_lang == 'en':
         return text
-    try:
-        # Translates from English (auto-detected) to your target (e.g., 'es')
-        return GoogleTranslator(source='auto', target=target_lang).translate(text)
-    except Exception as e:
-        print(f"Translation Error: {e}")
-        return text
+    return translate(text, target_lang)
 
 # CLEANING FUNCTIONS
 def clean_term(term):
@@ -55,110 +71,272 @@ def is_valid_term(term):
 
 # VISUAL EXPLANATION
 def generate_visual_explanation(term):
-    try:
-        safe_term = re.sub(r'[^a-zA-Z0-9_]', '_', term.strip())
-        img = Image.new("RGB", (900, 450), "white")
-        draw = ImageDraw.Draw(img)
-        try:
-            font_title = ImageFont.truetype("arial.ttf", 42)
-            font_body = ImageFont.truetype("arial.ttf", 22)
-        except:
-            font_title = ImageFont.load_default()
-            font_body = ImageFont.load_default()
-
-        draw.text((40, 20), term, fill="black", font=font_title)
-        os.makedirs("static/generated_images", exist_ok=True)
-        image_path = f"static/generated_images/{safe_term}.png"
-        img.save(image_path)
-        return f"generated_images/{safe_term}.png"
-    except:
-        return None
+    return visuals.render(term)
 
 # TEXT EXTRACTION
-def extract_text_from_file(filepath):
+# Files are parsed once into a document_model.Document (sections with a title and body); the
+# cache stores that, and every heuristic below reads sections rather than reopening the file.
+def _cache_key(filepath, content_hash=None):
+    # Identical files (even under different names) share one cache entry.
+    # Uploads arrive with their SHA-256 already computed (upload_store), so the file isn't read twice
     ext = os.path.splitext(filepath)[1].lower()
-    text = ""
+    return f"{content_hash or file_sha256(filepath)}{ext}-v{EXTRACTOR_VERSION}"
+
+def _open_document(filepath, content_hash=None):
+    # Returns (cache key, cached entry or None, page count, PdfReader or None). A cached entry is
+    # an open file positioned at the first section (the caller closes it); a cache hit doesn't
+    # touch the upload. Otherwise a PDF is opened here once and the parser reuses the reader.
+    # A file that can't be read comes back with no key, reported once.
+    try:
+        key = _cache_key(filepath, content_hash)
+    except OSError as e:
+        print(f"Extraction Error: {e}")
+        return None, None, 0, None
+
+    cached = text_cache.reader(key)
+    if cached is not None:
+        try:
+            pages = document_model.read_header(cached)
+        except (ValueError, KeyError, StopIteration) as e:
+            cached.close()
+            print(f"Extraction cache entry unreadable, extracting again: {e}")
+        else:
+            metrics.inc("extraction_cache_total", result="hit")
+            print(f"DEBUG: Extraction cache hit for {os.path.basename(filepath)}")
+            return key, cached, pages, None
+
+    metrics.inc("extraction_cache_total", result="miss")
     try:
-        if ext == ".txt":
-            with open(filepath, "r", encoding="utf-8", errors="ignore") as f: text = f.read()
-        elif ext == ".docx":
-            doc = Document(filepath)
-            text = "\n".join([para.text for para in doc.paragraphs])
-        elif ext == ".pdf":
-            reader = PdfReader(filepath)
-            text = "\n".join([page.extract_text() or "" for page in reader.pages])
-        elif ext in [".png", ".jpg", ".jpeg"]:
-            text = pytesseract.image_to_string(Image.open(filepath))
-        elif ext == ".pptx":
-            prs = Presentation(filepath)
-            text = "\n".join([shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, "text")])
+        reader = document_model.pdf_reader(filepath) if filepath.lower().endswith(".pdf") else None
+        pages = document_model.page_count(filepath, reader)
     except Exception as e:
         print(f"Extraction Error: {e}")
-    return text
+        return None, None, 0, None
+    return key, None, pages, reader
+
+def _load(filepath, key, cached, pages, reader):
+    # The whole Document, from the cache or parsed (big PDFs and decks on the process pool)
+    if cached is not None:
+        with cached:
+            return Document(list(document_model.load_sections(cached)), pages)
+    if key is None:
+        return Document()
+    with metrics.timed("extraction_seconds", file_type=os.path.splitext(filepath)[1].lower()):
+        document = document_model.parse(filepath, reader, pages)
+    # Failed or empty extractions are not cached so they get retried next time
+    if not document.is_empty():
+        text_cache.put(key, document.to_json())
+    return document
+
+def _iter_sections(filepath, key, cached, pages, reader):
+    # Sections one at a time, from the cache or as the file is read. A file being read is written
+    # to the cache a section at a time too, so even the bounded-memory mode never holds it whole
+    if cached is not None:
+        with cached:
+            yield from document_model.load_sections(cached)
+        return
+    if key is None:
+        return
+
+    with text_cache.writer(key) as entry:
+        entry.write(document_model.dump_header(pages))
+        empty = True
+        for section in document_model.iter_sections(filepath, reader):
+            entry.write(document_model.dump_section(section))
+            empty = empty and not section.text().strip()
+            yield section
+        if empty:
+            # Nothing written means no entry, so the extraction is retried next time
+            entry.seek(0)
+            entry.truncate()
+
+def _open_checked(filepath, content_hash=None):
+    # _open_document for generation: documents over the page limit are refused here
+    opened = _open_document(filepath, content_hash)
+    try:
+        memory_budget.check_pages(opened[2])
+    except memory_budget.DocumentTooLarge:
+        if opened[1] is not None:
+            opened[1].close()
+        raise
+    return opened
+
+def parse_document(filepath, content_hash=None):
+    return _load(filepath, *_open_document(filepath, content_hash))
+
+def extract_text_from_file(filepath, content_hash=None):
+    return parse_document(filepath, content_hash).text()
+
+def iter_sections(filepath, content_hash=None):
+    # Yields sections as the file is read so callers can start before the whole file is parsed
+    yield from _iter_sections(filepath, *_open_document(filepath, content_hash))
 
 # --- FLASHCARD GENERATION WITH TRANSLATION ---
-def generate_flashcards_from_file(filepath, language='en'):
-    print(f"DEBUG: Generating flashcards in language: {language}")
-    ext = os.path.splitext(filepath)[1].lower()
+LANG_CONFIG = {
+    'es': {"prefix": "¿Qué es", "suffix": "?"},
+    'en': {"prefix": "What is", "suffix": "?"}
+}
+
+def _report(progress, stage):
+    # progress is an optional callback used by background jobs to follow the pipeline
+    if progress:
+        progress(stage)
+
+# A heading over more text than this makes a poor flashcard answer
+MAX_SECTION_ANSWER_CHARS = 1000
+
+def _title_candidates(section):
+    # Slide title / document heading as the term, the text under it as the definition
+    content = [line.strip() for line in section.body.split('\n') if line.strip()]
+    answer = " ".join(content)
+    if is_valid_term(section.title) and content and len(answer) <= MAX_SECTION_ANSWER_CHARS:
+        return [(section.title, answer, 0.9)]
+    return []
+
+def _line_candidates(text):
+    candidates = []
+    for line in text.split('\n'):
+        if ":" in line:
+            parts = line.split(":", 1)
+            term = clean_term(parts[0])
+            definition = clean_text(parts[1])
+            if is_valid_term(term) and len(definition) > 10:
+                candidates.append((term, definition, 0.8))
+    return candidates
+
+ENGINES = ("heuristic", "spacy")
+
+def _text_candidates(text, engine):
+    candidates = _line_candidates(text)
+    if engine == "spacy":
+        # Imported here because spacy_engine builds on the helpers in this module
+        import spacy_engine
+        candidates += spacy_engine.definition_candidates(text)
+    return candidates
+
+def _section_candidates(section, engine):
+    return _title_candidates(section) + _text_candidates(section.text(), engine)
+
+def _make_cards(candidates, language):
+    # TRANSLATE HERE - every term and definition goes to the translator in one batch
+    l = LANG_CONFIG.get(language, LANG_CONFIG['en'])
+    strings = translate_many([text for term, definition, _ in candidates for text in (term, definition)], language)
     flashcards = []
+    for i, (term, definition, score) in enumerate(candidates):
+        final_term, final_content = strings[2 * i], strings[2 * i + 1]
+
+        flashcards.append({
+            "question": f"{l['prefix']} {final_term}{l['suffix']}",
+            "answer": final_content,
+            "visual_explanation": None,
+            "score": score
+        })
+    return flashcards
+
+def _visual_term(card, language):
+    # Generate visual using the translated term
+    l = LANG_CONFIG.get(language, LANG_CONFIG['en'])
+    return card["question"].replace(l['prefix'], "").replace(l['suffix'], "").strip()
+
+# Bounded-memory mode translates and dedupes once this many candidates have been mined
+BOUNDED_WINDOW_CANDIDATES = 200
+
+def _generate_bounded(sections, language, progress, engine):
+    # Pages are mined a window at a time and only the kept cards accumulate; see memory_budget.py
+    _report(progress, "generating")
+    seen = NearDuplicateIndex()
+    flashcards, window = [], []
 
-    lang_config = {
-        'es': {"prefix": "¿Qué es", "suffix": "?"},
-        'en': {"prefix": "What is", "suffix": "?"}
-    }
-    l = lang_config.get(language, lang_config['en'])
-
-    if ext == ".pptx":
-        prs = Presentation(filepath)
-        for slide in prs.slides:
-            title, content = "", []
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    if not title: title = shape.text.strip()
-                    else: content.append(shape.text.strip())
-            
-            if is_valid_term(title) and content:
-                # TRANSLATE HERE
-                final_term = translate_if_needed(title, language)
-                final_content = translate_if_needed(" ".join(content), language)
-
-                flashcards.append({
-                    "question": f"{l['prefix']} {final_term}{l['suffix']}",
-                    "answer": final_content,
-                    "visual_explanation": None,
-                    "score": 0.9
-                })
-    else:
-        text = extract_text_from_file(filepath)
-        for line in text.split('\n'):
-            if ":" in line:
-                parts = line.split(":", 1)
-                term = clean_term(parts[0])
-                definition = clean_text(parts[1])
-                if is_valid_term(term) and len(definition) > 10:
-                    # TRANSLATE HERE
-                    final_term = translate_if_needed(term, language)
-                    final_content = translate_if_needed(definition, language)
-
-                    flashcards.append({
-                        "question": f"{l['prefix']} {final_term}{l['suffix']}",
-                        "answer": final_content,
-                        "visual_explanation": None,
-                        "score": 0.8
-                    })
-
-    # Deduplicate and finalize
-    unique = {c["question"].lower(): c for c in flashcards}
-    flashcards = list(unique.values())
-
-    for card in flashcards[:MAX_VISUALS]:
-        # Generate visual using the translated term
-        clean_q = card["question"].replace(l['prefix'], "").replace(l['suffix'], "").strip()
-        card["visual_explanation"] = generate_visual_explanation(clean_q)
+    def flush():
+        with metrics.timed("generation_stage_seconds", stage="translate"):
+            cards = _make_cards(window, language)
+        with metrics.timed("generation_stage_seconds", stage="dedupe"):
+            flashcards.extend(card for card in cards if not seen.is_duplicate(card))
+        window.clear()
+
+    for section in sections:
+        window.extend(_section_candidates(section, engine))
+        if len(window) >= BOUNDED_WINDOW_CANDIDATES:
+            flush()
+        memory_budget.check()
+    flush()
+    return flashcards
+
+def generate_flashcards_from_file(filepath, language='en', progress=None, engine='heuristic', content_hash=None):
+    print(f"DEBUG: Generating flashcards in language: {language} (engine: {engine})")
+    _report(progress, "extracting")
+    with metrics.timed("generation_stage_seconds", stage="extract"):
+        opened = _open_checked(filepath, content_hash)
+        pages = opened[2]
+        bounded = memory_budget.use_bounded_mode(pages)
+        if not bounded:
+            document = _load(filepath, *opened)
+    if bounded:
+        print(f"DEBUG: {pages} pages, using the bounded-memory mode")
+        flashcards = _generate_bounded(_iter_sections(filepath, *opened), language, progress, engine)
+        return _finish_cards(flashcards, language, progress)
+
+    _report(progress, "generating")
+    with metrics.timed("generation_stage_seconds", stage="generate"):
+        candidates = [c for section in document.sections for c in _title_candidates(section)]
+        # One pass over the whole text, so the spaCy engine can batch every sentence together
+        candidates += _text_candidates(document.text(), engine)
+
+    _report(progress, "translating")
+    with metrics.timed("generation_stage_seconds", stage="translate"):
+        flashcards = _make_cards(candidates, language)
+
+    # Drop repeated questions and near-identical answers (LSH-blocked, see dedupe.py)
+    with metrics.timed("generation_stage_seconds", stage="dedupe"):
+        flashcards = dedupe_cards(flashcards)
+    return _finish_cards(flashcards, language, progress)
+
+def _finish_cards(flashcards, language, progress):
+    _report(progress, "rendering")
+    with metrics.timed("generation_stage_seconds", stage="render"):
+        with_visuals = flashcards[:MAX_VISUALS]
+        paths = visuals.render_many([_visual_term(card, language) for card in with_visuals])
+        for card, path in zip(with_visuals, paths):
+            card["visual_explanation"] = path
 
     random.shuffle(flashcards)
+    metrics.inc("cards_generated_total", len(flashcards), generator="batch")
     return flashcards
 
+def iter_flashcards_from_file(filepath, language='en', engine='heuristic', content_hash=None):
+    # Streaming variant: yields cards section by section (page, slide, ...), dropping near-duplicates as it goes.
+    # Cards come out in document order; shuffling is left to the client.
+    print(f"DEBUG: Streaming flashcards in language: {language}")
+    opened = _open_checked(filepath, content_hash)
+    bounded = memory_budget.use_bounded_mode(opened[2])
+
+    seen = NearDuplicateIndex()
+    kept = 0
+    for section in _iter_sections(filepath, *opened):
+        if bounded:
+            memory_budget.check()
+        for card in _make_cards(_section_candidates(section, engine), language):
+            if seen.is_duplicate(card):
+                continue
+            kept += 1
+            metrics.inc("cards_generated_total", generator="stream")
+            if kept <= MAX_VISUALS:
+                card["visual_explanation"] = visuals.render_async(_visual_term(card, language))
+            yield card
+
+def _normalize_answer(answer):
+    return answer.lower().strip()
+
 def is_answer_correct(user_answer, correct_answer, threshold=75):
-    user_answer, correct_answer = user_answer.lower().strip(), correct_answer.lower().strip()
-    return fuzz.ratio(user_answer, correct_answer) >= threshold
\ No newline at end of file
+    user_answer, correct_answer = _normalize_answer(user_answer), _normalize_answer(correct_answer)
+    return fuzz.ratio(user_answer, correct_answer) >= threshold
+
+def grade_answers(user_answers, correct_answers, threshold=75):
+    # Same rule as is_answer_correct, scored pairwise in one vectorized rapidfuzz call
+    if not user_answers:
+        return []
+    scores = process.cpdist(
+        user_answers, correct_answers,
+        scorer=fuzz.ratio, processor=_normalize_answer, workers=-1
+    )
+    return [bool(score >= threshold) for score in scores]
\ No newline at end of file
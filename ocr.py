@@ -0,0 +1,179 @@
+# ocr.py
+# OCR for image uploads and for scanned PDF pages that have no text layer.
+#
+# Images are converted to grayscale, downscaled to OCR_TARGET_DPI (phone photos and scans
+# are often 600 dpi+, which only makes tesseract slower) and binarized with an Otsu
+# threshold before recognition. Pages are recognised in parallel on a bounded thread pool:
+# the work happens in tesseract, so threads are enough.
+#
+# With the optional tesserocr package each worker thread keeps one tesseract engine alive;
+# otherwise pytesseract starts a tesseract process per page (capped to one thread each so
+# OCR_WORKERS processes don't oversubscribe the CPU).
+#
+# Results are cached on disk by the SHA-256 of the image bytes, so a re-upload or the same
+# scan inside another PDF is never recognised twice.
+
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import lazy_deps
+import metrics
+from disk_cache import DiskCache
+from pools import ProcessLocalPool
+
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", min(4, os.cpu_count() or 1)))
+OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", 300))
+# Longest side a page is ever recognised at, whatever DPI the image claims
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", 3500))
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+# OCR PDF pages that have no text layer (scans, photographed handouts)
+OCR_PDF_PAGES = os.environ.get("OCR_PDF_PAGES", "true").lower() == "true"
+# Bump when preprocessing changes so stale cache entries are ignored
+OCR_VERSION = 2
+
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+ocr_cache = DiskCache(
+    os.environ.get("OCR_CACHE_DIR", "cache/ocr"),
+    max_bytes=int(os.environ.get("OCR_CACHE_MAX_MB", 100)) * 1024 * 1024,
+    max_age_seconds=int(os.environ.get("OCR_CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600
+)
+
+_pool = ProcessLocalPool(lambda: ThreadPoolExecutor(max_workers=OCR_WORKERS))
+_engines = threading.local()
+
+
+# ---------------- Preprocessing ----------------
+def _otsu_threshold(histogram):
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background, weighted_background = 0, 0
+    best, threshold = -1, 128
+    for i, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += i * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        between = background * foreground * (mean_background - mean_foreground) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def preprocess(image):
+    # Grayscale, scaled to OCR_TARGET_DPI and at most OCR_MAX_SIDE (never up), then black text on white
+    Image = lazy_deps.load("PIL.Image")
+    ImageOps = lazy_deps.load("PIL.ImageOps")
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    # Phone photos are often tagged 72 dpi whatever their size, so the side cap always applies
+    dpi = image.info.get("dpi", (0, 0))[0]
+    scale = OCR_MAX_SIDE / max(image.size)
+    if dpi:
+        scale = min(scale, OCR_TARGET_DPI / dpi)
+    if scale < 1:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+
+    image = ImageOps.autocontrast(image)
+    threshold = _otsu_threshold(image.histogram())
+    return image.point(lambda value: 255 if value > threshold else 0, mode="1")
+
+
+# ---------------- Recognition ----------------
+def _tesserocr_engine():
+    engine = getattr(_engines, "api", None)
+    if engine is None:
+        engine = lazy_deps.load("tesserocr").PyTessBaseAPI(lang=OCR_LANG)
+        _engines.api = engine
+    return engine
+
+
+def _recognise(image):
+    try:
+        engine = _tesserocr_engine()
+    except ImportError:
+        return lazy_deps.load("pytesseract").image_to_string(image, lang=OCR_LANG)
+    engine.SetImage(image)
+    return engine.GetUTF8Text()
+
+
+def ocr_image_bytes(data):
+    # Text in one encoded image (PNG, JPEG, ...); "" if it can't be read
+    key = f"{hashlib.sha256(data).hexdigest()}-ocr-v{OCR_VERSION}-{OCR_LANG}-{OCR_TARGET_DPI}"
+    text = ocr_cache.get(key)
+    if text is not None:
+        metrics.inc("ocr_pages_total", result="cached")
+        return text
+
+    try:
+        with metrics.timed("generation_stage_seconds", stage="ocr"):
+            image = lazy_deps.load("PIL.Image").open(io.BytesIO(data))
+            text = _recognise(preprocess(image)).strip()
+    except Exception as e:
+        print(f"OCR Error: {e}")
+        metrics.inc("ocr_pages_total", result="failed")
+        return ""
+    metrics.inc("ocr_pages_total", result="recognised")
+    ocr_cache.put(key, text)
+    return text
+
+
+def ocr_many(images):
+    # images: encoded image bytes; texts come back in the same order.
+    # Repeated images (a logo on every scanned page) are recognised once
+    unique = list(dict.fromkeys(images))
+    if len(unique) <= 1:
+        texts = [ocr_image_bytes(data) for data in unique]
+    else:
+        texts = list(_pool.get().map(ocr_image_bytes, unique))
+    by_image = dict(zip(unique, texts))
+    return [by_image[data] for data in images]
+
+
+def image_file_text(filepath):
+    with open(filepath, "rb") as f:
+        return ocr_image_bytes(f.read())
+
+
+# ---------------- Scanned PDFs ----------------
+def page_images(page):
+    # Encoded images on a PDF page, largest first (a scanned page is usually one big image)
+    try:
+        images = [image.data for image in page.images]
+    except Exception as e:
+        print(f"OCR Error: could not read page images: {e}")
+        return []
+    return sorted(images, key=len, reverse=True)
+
+
+def fill_scanned_pages(reader, texts, start=0):
+    # Replaces the empty entries of texts (one per page of reader, from page start) with OCR text, in place
+    empty = [i for i, text in enumerate(texts) if not text.strip()]
+    if OCR_PDF_PAGES and empty:
+        for i, text in zip(empty, ocr_pdf_pages([reader.pages[start + i] for i in empty])):
+            texts[i] = text
+    return texts
+
+
+def ocr_pdf_pages(pages):
+    # OCR text for each PDF page object; pages without images give ""
+    jobs = []
+    for index, page in enumerate(pages):
+        for data in page_images(page):
+            jobs.append((index, data))
+    texts = ocr_many([data for _, data in jobs])
+
+    results = [[] for _ in pages]
+    for (index, _), text in zip(jobs, texts):
+        if text:
+            results[index].append(text)
+    return ["\n".join(parts) for parts in results]
@@ -0,0 +1,158 @@
+# parallel_extract.py
+# Splits big PDFs and slide decks into page ranges and extracts them on a process pool.
+# PDF pages without a text layer are OCRed afterwards in the parent (see ocr.py).
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import lazy_deps
+import ocr
+from pools import ProcessLocalPool
+
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+# Below this many pages the cost of starting workers outweighs the gain
+PARALLEL_MIN_PAGES = int(os.environ.get("PARALLEL_MIN_PAGES", 40))
+MIN_PAGES_PER_CHUNK = 8
+# Range size when pages are streamed (iter_pdf_pages, iter_pptx_sections) rather than collected
+STREAM_CHUNK_PAGES = int(os.environ.get("STREAM_CHUNK_PAGES", 32))
+
+_pool = ProcessLocalPool(lambda: ProcessPoolExecutor(max_workers=EXTRACT_WORKERS))
+
+
+def _page_ranges(count, workers):
+    # Roughly two chunks per worker keeps them busy when some pages are heavier than others
+    size = max(MIN_PAGES_PER_CHUNK, -(-count // (workers * 2)))
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+# ---------------- Workers (run in child processes) ----------------
+def _pdf_page_text(page):
+    return page.extract_text() or ""
+
+
+def slide_section(slide):
+    # (title, body): the first text on the slide is its title, the rest is the body
+    texts = [shape.text.strip() for shape in slide.shapes if hasattr(shape, "text") and shape.text.strip()]
+    return (texts[0], "\n".join(texts[1:])) if texts else ("", "")
+
+
+def _pdf_range(filepath, start, stop):
+    reader = lazy_deps.load("PyPDF2").PdfReader(filepath)
+    return [_pdf_page_text(reader.pages[i]) for i in range(start, stop)]
+
+
+def _pptx_range(filepath, start, stop):
+    slides = list(lazy_deps.load("pptx").Presentation(filepath).slides)
+    return [slide_section(slide) for slide in slides[start:stop]]
+
+
+def _failed(error):
+    print(f"Parallel extraction failed, falling back to serial: {error}")
+    if isinstance(error, BrokenProcessPool):
+        # A worker died; the next extraction gets a fresh pool
+        _pool.reset()
+
+
+def _run_parallel(worker, filepath, count, workers):
+    try:
+        pool = _pool.get()
+        futures = [pool.submit(worker, filepath, start, stop) for start, stop in _page_ranges(count, workers)]
+        # Collect in submission order so pages come back in document order
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except Exception as e:
+        _failed(e)
+        return None
+
+
+def _submit(worker, filepath, start, stop):
+    try:
+        return _pool.get().submit(worker, filepath, start, stop)
+    except Exception as e:
+        _failed(e)
+        return None
+
+
+def _iter_parallel(worker, filepath, count, workers):
+    # Yields (start, pages) for ranges of STREAM_CHUNK_PAGES in document order, with at most
+    # `workers` ranges in flight, so the caller never holds more than a few ranges. pages is None
+    # where the pool failed; the caller then extracts that range itself
+    pending = deque()
+    try:
+        for start in range(0, count, STREAM_CHUNK_PAGES):
+            stop = min(start + STREAM_CHUNK_PAGES, count)
+            pending.append((start, _submit(worker, filepath, start, stop)))
+            if len(pending) > workers:
+                yield _collect(*pending.popleft())
+        while pending:
+            yield _collect(*pending.popleft())
+    finally:
+        # The caller stopped early: drop the ranges nobody will read
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def _collect(start, future):
+    try:
+        return start, future.result() if future is not None else None
+    except Exception as e:
+        _failed(e)
+        return start, None
+
+
+# ---------------- Public API ----------------
+def extract_pdf_pages(filepath, workers=None, reader=None):
+    # reader: a PdfReader the caller already opened for this file
+    workers = workers or EXTRACT_WORKERS
+    reader = reader or lazy_deps.load("PyPDF2").PdfReader(filepath)
+    count = len(reader.pages)
+    if workers > 1 and count >= PARALLEL_MIN_PAGES:
+        pages = _run_parallel(_pdf_range, filepath, count, workers)
+        if pages is not None:
+            return ocr.fill_scanned_pages(reader, pages)
+    return ocr.fill_scanned_pages(reader, [_pdf_page_text(page) for page in reader.pages])
+
+
+def extract_pptx_sections(filepath, workers=None):
+    workers = workers or EXTRACT_WORKERS
+    slides = list(lazy_deps.load("pptx").Presentation(filepath).slides)
+    count = len(slides)
+    if workers > 1 and count >= PARALLEL_MIN_PAGES:
+        pages = _run_parallel(_pptx_range, filepath, count, workers)
+        if pages is not None:
+            return pages
+    return [slide_section(slide) for slide in slides]
+
+
+def iter_pdf_pages(filepath, workers=None, reader=None):
+    # The text of each page in order, extracted on the pool a range at a time when the PDF is
+    # big enough; unlike extract_pdf_pages the whole document is never held at once
+    workers = workers or EXTRACT_WORKERS
+    reader = reader or lazy_deps.load("PyPDF2").PdfReader(filepath)
+    count = len(reader.pages)
+    if workers > 1 and count >= PARALLEL_MIN_PAGES:
+        for start, pages in _iter_parallel(_pdf_range, filepath, count, workers):
+            if pages is None:
+                pages = [_pdf_page_text(reader.pages[i]) for i in range(start, min(start + STREAM_CHUNK_PAGES, count))]
+            yield from ocr.fill_scanned_pages(reader, pages, start)
+        return
+    for start, page in enumerate(reader.pages):
+        yield from ocr.fill_scanned_pages(reader, [_pdf_page_text(page)], start)
+
+
+def iter_pptx_sections(filepath, count, workers=None):
+    # (title, body) of each slide in order; count is the number of slides (document_model.page_count)
+    workers = workers or EXTRACT_WORKERS
+    if workers > 1 and count >= PARALLEL_MIN_PAGES:
+        for start, sections in _iter_parallel(_pptx_range, filepath, count, workers):
+            if sections is None:
+                sections = _pptx_range(filepath, start, min(start + STREAM_CHUNK_PAGES, count))
+            yield from sections
+        return
+    for slide in lazy_deps.load("pptx").Presentation(filepath).slides:
+        yield slide_section(slide)
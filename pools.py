@@ -0,0 +1,34 @@
+# pools.py
+# Module-level executors that are built on first use and belong to the process that built them.
+# A pool inherited through fork (the generation job workers) has none of the parent's threads or
+# worker processes behind it, so a forked child drops the inherited pool and builds its own.
+
+import os
+import threading
+
+
+class ProcessLocalPool:
+    def __init__(self, factory):
+        # factory builds the executor; it runs on first use, so it sees the settings of that moment
+        self._factory = factory
+        self._pool = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The lock may have been held by a thread that doesn't exist in the child
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def get(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._factory()
+            return self._pool
+
+    def reset(self):
+        # Shuts the pool down (a broken one, say); the next get() builds a new one
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
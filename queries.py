@@ -0,0 +1,32 @@
+# queries.py
+# Read-side MongoDB queries shared by the routes and the benchmarks.
+
+
+def set_summaries(db, user_id):
+    # One round trip for the "my sets" page: every set of the user with its card count and
+    # average quiz score, counted on the server instead of loading every card and progress record.
+    # The $lookup form with localField + pipeline (MongoDB 5.0+) uses the set_id indexes.
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$lookup": {
+            "from": "flashcards",
+            "localField": "_id",
+            "foreignField": "set_id",
+            "pipeline": [{"$count": "n"}],
+            "as": "card_count"
+        }},
+        {"$lookup": {
+            "from": "progress",
+            "localField": "_id",
+            "foreignField": "set_id",
+            "pipeline": [{"$group": {"_id": None, "avg": {"$avg": {"$ifNull": ["$score", 0]}}}}],
+            "as": "progress_avg"
+        }},
+        {"$addFields": {
+            "_id": {"$toString": "$_id"},
+            "count": {"$ifNull": [{"$first": "$card_count.n"}, 0]},
+            "avg_score": {"$ifNull": [{"$first": "$progress_avg.avg"}, 0]}
+        }},
+        {"$project": {"card_count": 0, "progress_avg": 0}}
+    ]
+    return list(db["flashcardsets"].aggregate(pipeline))
@@ -0,0 +1,48 @@
+# scheduler.py
+# Spaced repetition for mastery and quiz sessions. Every answered card carries interval_days
+# and next_due: a right answer multiplies the interval by EASE (the first one schedules the
+# card a day out), a wrong one resets it and brings the card back after RELEARN_MINUTES.
+# The stages below run inside the same update pipeline as the mastery counters, so MongoDB
+# schedules the card atomically with the answer that caused it.
+#
+# Sessions read only what is due through the (user_id, set_id, next_due) index declared in
+# indexes.py, so a session on a 10k-card set touches a few dozen documents.
+
+import os
+from datetime import datetime
+
+EASE = 2.5
+FIRST_INTERVAL_DAYS = 1
+MAX_INTERVAL_DAYS = 365
+RELEARN_MINUTES = 10
+DUE_BATCH_SIZE = int(os.environ.get("DUE_BATCH_SIZE", 20))
+
+_DAY_MS = 24 * 60 * 60 * 1000
+
+
+def schedule_stages(is_correct):
+    # Update pipeline stages that set interval_days and next_due from the stored interval
+    if not is_correct:
+        return [{"$set": {
+            "interval_days": 0,
+            "next_due": {"$add": ["$$NOW", RELEARN_MINUTES * 60 * 1000]}
+        }}]
+    return [
+        {"$set": {"interval_days": {"$min": [MAX_INTERVAL_DAYS, {"$max": [
+            FIRST_INTERVAL_DAYS,
+            {"$multiply": [{"$ifNull": ["$interval_days", 0]}, EASE]}
+        ]}]}}},
+        {"$set": {"next_due": {"$add": ["$$NOW", {"$multiply": ["$interval_days", _DAY_MS]}]}}},
+    ]
+
+
+def due_cards(flashcards, user_id, set_id, projection, limit=DUE_BATCH_SIZE, now=None):
+    # The next `limit` due cards, most overdue first, then ones that were never answered
+    base = {"user_id": user_id, "set_id": set_id}
+    cards = list(flashcards.find(
+        {**base, "next_due": {"$lte": now or datetime.utcnow()}}, projection
+    ).sort("next_due", 1).limit(limit))
+    if len(cards) < limit:
+        # New cards have no next_due yet; the equality match on null uses the same index
+        cards += flashcards.find({**base, "next_due": None}, projection).limit(limit - len(cards))
+    return cards
@@ -0,0 +1,90 @@
+# spacy_engine.py
+# Second generation engine: mines definitional sentences ("Osmosis is the movement of ...")
+# from prose notes with spaCy, on top of the colon heuristic used by the default engine.
+
+import os
+import re
+
+from nlp import get_spacy_model, clean_term, clean_text, is_valid_term
+
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", 256))
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", 1))
+# Only the parser (noun chunks, subjects) and tagger are needed. With the lemmatizer off
+# Token.lemma_ is empty, so cue verbs are matched on their lowercased form
+UNUSED_PIPES = ["ner", "lemmatizer", "textcat", "entity_ruler"]
+
+# Cheap pre-filter so spaCy only sees sentences that could be definitions
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+DEFINITION_CUE = re.compile(r'\b(is|are|refers? to|means|is defined as|is known as|is called)\b', re.IGNORECASE)
+# Used when the loaded model has no dependency parser
+DEFINITION_PATTERN = re.compile(
+    r'^(?P<term>[A-Za-z][\w\s\-]{2,60}?)\s+'
+    r'(?:(?:is|are)\s+(?:defined as|known as|called)?\s*(?=(?:a|an|the)\b)|refers? to\s+|means\s+)'
+    r'(?P<definition>.+)$',
+    re.IGNORECASE
+)
+CUE_WORDS = {"is", "are", "was", "were", "refers", "refer", "referred", "means", "mean", "meant",
+             "defined", "called", "known"}
+MAX_TERM_TOKENS = 6
+SCORE = 0.75
+
+
+def _sentences(text):
+    # Lines without a colon are joined into paragraphs, then split into sentences
+    for paragraph in re.split(r'\n\s*\n', text):
+        lines = [line.strip() for line in paragraph.split('\n') if line.strip() and ":" not in line]
+        for sentence in SENTENCE_SPLIT.split(" ".join(lines)):
+            if 20 <= len(sentence) <= 400 and DEFINITION_CUE.search(sentence):
+                yield sentence
+
+
+def _candidate(term, definition):
+    term = clean_term(re.sub(r'^(a|an|the)\s+', '', term.strip(), flags=re.IGNORECASE))
+    definition = clean_text(definition).rstrip(". ")
+    if is_valid_term(term) and len(definition) > 10:
+        return (term, definition[0].upper() + definition[1:], SCORE)
+    return None
+
+
+def _from_parse(doc):
+    # "<subject noun chunk> <be|refer|mean|...> <definition>"
+    root = next(iter(doc.sents)).root
+    if root.lower_ not in CUE_WORDS:
+        return None
+    subject = next((t for t in root.children if t.dep_ in ("nsubj", "nsubjpass")), None)
+    if subject is None or subject.pos_ == "PRON":
+        return None
+
+    chunk = next((nc for nc in doc.noun_chunks if nc.root == subject), None)
+    term = chunk if chunk is not None else doc[subject.left_edge.i:subject.right_edge.i + 1]
+    if len(term) > MAX_TERM_TOKENS:
+        return None
+
+    start = root.i + 1
+    # Skip the particle in "refers to", "is defined as", "is known as"
+    while start < len(doc) and doc[start].lower_ in ("to", "as"):
+        start += 1
+    return _candidate(term.text, doc[start:].text)
+
+
+def _from_pattern(sentence):
+    match = DEFINITION_PATTERN.match(sentence)
+    if match and len(match.group("term").split()) <= MAX_TERM_TOKENS:
+        return _candidate(match.group("term"), match.group("definition"))
+    return None
+
+
+def definition_candidates(text, batch_size=None, n_process=None):
+    model = get_spacy_model()
+    sentences = list(_sentences(text))
+    if "parser" not in model.pipe_names:
+        return [c for c in map(_from_pattern, sentences) if c]
+
+    disable = [name for name in UNUSED_PIPES if name in model.pipe_names]
+    docs = model.pipe(
+        sentences,
+        batch_size=batch_size or SPACY_BATCH_SIZE,
+        n_process=n_process or SPACY_N_PROCESS,
+        disable=disable
+    )
+    return [c for c in map(_from_parse, docs) if c]
@@ -21,30 +21,55 @@ document.getElementById('fileInput').onchange = function() {
     uploadForm.style.display = 'none';
     loadingStatus.style.display = 'block';
 
-    let width = 0;
-    const interval = setInterval(() => {
-        if (width >= 96) {
-            clearInterval(interval);
-        } else {
-            width += Math.floor(Math.random() * 8) + 1;
-            setProgress(width);
-        }
-    }, 500);
+    function showError(message) {
+        alert(message);
+        uploadForm.style.display = 'block';
+        loadingStatus.style.display = 'none';
+    }
+
+    function networkError() {
+        showError('Could not reach the server, please try again.');
+    }
+
+    // Generation runs as a background job, poll its status until it finishes
+    function pollJob(job) {
+        fetch(job.status_url)
+        .then(res => res.json())
+        .then(status => {
+            if (!status.ok) return showError(status.error);
+
+            if (status.state !== 'failed') setProgress(status.progress);
+            if (status.state !== 'done' && status.state !== 'failed') {
+                setTimeout(() => pollJob(job), 1000);
+                return;
+            }
+
+            // Failed jobs are collected too, so the server can let go of the upload straight away
+            fetch(job.result_url)
+            .then(res => res.json())
+            .then(data => {
+                if (data.ok) window.location.href = data.redirect;
+                else showError(data.error);
+            })
+            .catch(networkError);
+        })
+        .catch(networkError);
+    }
+
+    setProgress(0);
 
     const formData = new FormData();
     formData.append('notes_file', file);
     formData.append('target_lang', document.getElementById('targetLanguage').value);
+    formData.append('engine', document.getElementById('engine').value);
 
     fetch(UPLOAD_URL, { method: "POST", body: formData })
     .then(res => res.json())
     .then(data => {
-        clearInterval(interval);
-        setProgress(100);
-        if (data.ok) window.location.href = data.redirect;
-        else {
-            alert(data.error);
-            uploadForm.style.display = 'block';
-            loadingStatus.style.display = 'none';
-        }
-    });
+        if (!data.ok) showError(data.error);
+        // Streamed generation opens the review page, which shows the cards as they arrive
+        else if (data.redirect) window.location.href = data.redirect;
+        else pollJob(data);
+    })
+    .catch(networkError);
 };
\ No newline at end of file
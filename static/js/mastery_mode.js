@@ -1,34 +1,108 @@
 // mastery_mode.js
 
-let allCards = [...flashcards]; 
+let allCards = [];
 let currentCard = null;
 
+// The server's scheduler decides what comes next: cards are fetched a small batch at a time
+// from the due endpoint, most overdue first, and answering a card reschedules it.
+// The footer counts start from the server's totals and follow the answers given here.
+const counts = { ...STATUS_COUNTS };
+const seen = new Map();
+
+function fetchDue() {
+    // Answers still waiting to sync haven't rescheduled their cards yet, so skip those
+    const waiting = new Set(loadPending().map(a => a.card_id));
+    return fetch(DUE_URL)
+        .then(res => res.json())
+        .then(data => {
+            allCards = data.cards.filter(c => !waiting.has(c._id));
+        });
+}
+
+function setStatus(card, status, masteryScore) {
+    if (status && card.status !== status) {
+        counts[card.status] -= 1;
+        counts[status] += 1;
+        card.status = status;
+    }
+    card.mastery_score = masteryScore;
+}
+
+// Answers given while offline wait here and are sent in one batch once we're back online
+const PENDING_KEY = "pendingAnswers:" + location.pathname;
+
+function loadPending() {
+    return JSON.parse(localStorage.getItem(PENDING_KEY) || "[]");
+}
+
+function savePending(pending) {
+    if (pending.length) {
+        localStorage.setItem(PENDING_KEY, JSON.stringify(pending));
+    } else {
+        localStorage.removeItem(PENDING_KEY);
+    }
+}
+
+function applyResult(result) {
+    const card = seen.get(result.card_id);
+    if (card && result.status) setStatus(card, result.status, result.mastery_score);
+}
+
+function flushPending() {
+    const pending = loadPending();
+    if (!pending.length || !navigator.onLine) return;
+
+    fetch("/check_answers_batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ mode: "mastery", answers: pending })
+    })
+    .then(res => {
+        if (!res.ok) throw new Error("Batch sync failed: " + res.status);
+        return res.json();
+    })
+    .then(data => {
+        // Drop only what was sent; anything answered meanwhile stays queued
+        savePending(loadPending().slice(pending.length));
+        data.results.forEach(applyResult);
+        updateStats();
+        if (!currentCard) getNextCard();
+    })
+    .catch(err => console.error("Error:", err));
+}
+
+window.addEventListener("online", flushPending);
+
 /**
- * Grabs the next card that isn't 'green'.
- * If all are green, shows the success screen.
+ * Grabs the next due card, fetching another batch when this one is used up.
+ * If nothing is due, shows the success screen.
  */
-function getNextCard() {
-    // 1. Filter out already mastered cards
-    const remaining = allCards.filter(c => c.status !== "green");
+async function getNextCard() {
+    // 1. Refill from the scheduler once the current batch has been answered
+    if (allCards.length === 0) {
+        try {
+            await fetchDue();
+        } catch (err) {
+            console.error("Error:", err);
+            currentCard = null;
+            document.getElementById("masteryFeedback").textContent = "📴 Offline - reconnect to get the next cards.";
+            return;
+        }
+    }
 
-    // 2. If nothing is left, stop the loop
-    if (remaining.length === 0) {
+    // 2. If nothing is due, stop the loop
+    if (allCards.length === 0) {
+        const total = counts.green + counts.amber + counts.red;
+        const percent = total ? Math.round((counts.green / total) * 100) : 100;
         document.getElementById("masteryCard").style.display = "none";
         document.getElementById("masteryComplete").style.display = "block";
-        document.getElementById("masteryStats").innerHTML = "<b>Session Complete! 100% Mastered</b>";
+        document.getElementById("masteryStats").innerHTML = `<b>Session Complete! ${percent}% Mastered</b>`;
         return;
     }
 
-    // 3. Sort remaining: Red first, then Amber
-    remaining.sort((a, b) => {
-        const order = { red: 0, amber: 1 };
-        const statusA = a.status || "red";
-        const statusB = b.status || "red";
-        return order[statusA] - order[statusB];
-    });
-
-    // 4. Set current card and update UI
-    currentCard = remaining[0];
+    // 3. Set current card and update UI
+    currentCard = allCards.shift();
+    seen.set(currentCard._id, currentCard);
     document.getElementById("masteryQuestion").textContent = currentCard.question;
     document.getElementById("masteryInput").value = "";
     document.getElementById("masteryFeedback").textContent = "";
@@ -38,6 +112,8 @@ document.getElementById("submitMastery").addEventListener("click", () => {
     const userAnswer = document.getElementById("masteryInput").value;
     const btn = document.getElementById("submitMastery");
 
+    if (!currentCard) return;
+
     if (!userAnswer.trim()) {
         alert("Please enter an answer.");
         return;
@@ -61,12 +137,8 @@ document.getElementById("submitMastery").addEventListener("click", () => {
         feedback.innerHTML = data.correct ? "✅ Spot on!" : `❌ Not quite. (Status: ${data.status})`;
         feedback.className = data.correct ? "feedback-msg correct" : "feedback-msg incorrect";
 
-        // Update the local data so the filter picks it up next time
-        const index = allCards.findIndex(c => c._id === currentCard._id);
-        if (index !== -1) {
-            allCards[index].status = data.status;
-            allCards[index].mastery_score = data.mastery_score;
-        }
+        // Keep the footer counts in step with the server
+        setStatus(currentCard, data.status, data.mastery_score);
 
         updateStats();
 
@@ -79,23 +151,33 @@ document.getElementById("submitMastery").addEventListener("click", () => {
     })
     .catch(err => {
         console.error("Error:", err);
+        if (!navigator.onLine) {
+            // Keep going offline; the answer is graded when the batch syncs
+            const pending = loadPending();
+            pending.push({ card_id: currentCard._id, user_answer: userAnswer });
+            savePending(pending);
+            document.getElementById("masteryFeedback").textContent = "📴 Offline - answer saved, it will be checked when you reconnect.";
+            setTimeout(() => {
+                btn.disabled = false;
+                btn.innerText = "Submit Answer";
+                getNextCard();
+            }, 1500);
+            return;
+        }
         btn.disabled = false;
         btn.innerText = "Error - Try Again";
     });
 });
 
 function updateStats() {
-    const green = allCards.filter(c => c.status === "green").length;
-    const amber = allCards.filter(c => c.status === "amber").length;
-    const red = allCards.filter(c => (!c.status || c.status === "red")).length;
-
     document.getElementById("masteryStats").innerHTML = `
-        <span style="color:#2ecc71">● Green: ${green}</span> | 
-        <span style="color:#f39c12">● Amber: ${amber}</span> | 
-        <span style="color:#e74c3c">● Red: ${red}</span>
+        <span style="color:#2ecc71">● Green: ${counts.green}</span> | 
+        <span style="color:#f39c12">● Amber: ${counts.amber}</span> | 
+        <span style="color:#e74c3c">● Red: ${counts.red}</span>
     `;
 }
 
 // Start the session
 updateStats();
-getNextCard();
\ No newline at end of file
+getNextCard();
+flushPending();
\ No newline at end of file
@@ -0,0 +1,167 @@
+# translation.py
+# Batched, cached translation for generated flashcards.
+# All strings of a document go through translate_many, which serves what it can from a
+# persistent (text, target_lang) cache and sends the rest to the backend in chunks.
+
+import os
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import lazy_deps
+import metrics
+
+TRANSLATION_BACKEND = os.environ.get("TRANSLATION_BACKEND", "google")
+TRANSLATION_CHUNK_SIZE = int(os.environ.get("TRANSLATION_CHUNK_SIZE", 25))
+TRANSLATION_CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY", 4))
+TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH", "cache/translations.sqlite3")
+# Google rejects requests much over 5000 characters
+MAX_CHUNK_CHARS = 4500
+
+
+# ---------------- Backends ----------------
+class GoogleBackend:
+    # Sends a whole chunk as one newline separated request instead of one request per string
+    def __init__(self):
+        self.calls = 0
+
+    def translate_batch(self, texts, target_lang):
+        # A translator keeps the text of its current request on itself, so chunks translated
+        # at the same time must not share one; they are cheap to build
+        translator = lazy_deps.load("deep_translator").GoogleTranslator(source='auto', target=target_lang)
+        self.calls += 1
+        joined = translator.translate("\n".join(texts)) or ""
+        parts = joined.split("\n")
+        if len(parts) == len(texts):
+            return [part.strip() for part in parts]
+
+        # The service merged or split lines, so fall back to one call per string for this chunk
+        self.calls += len(texts)
+        return [translator.translate(text) or text for text in texts]
+
+
+class LocalBackend:
+    # Offline stand-in for tests and benchmarks: tags the text instead of translating it
+    def __init__(self):
+        self.calls = 0
+
+    def translate_batch(self, texts, target_lang):
+        self.calls += 1
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+BACKENDS = {"google": GoogleBackend, "local": LocalBackend}
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS.get(TRANSLATION_BACKEND, GoogleBackend)()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+# ---------------- Persistent cache ----------------
+def _key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _connect():
+    directory = os.path.dirname(TRANSLATION_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(TRANSLATION_CACHE_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS translations ("
+        "target TEXT NOT NULL, source_key TEXT NOT NULL, translated TEXT NOT NULL, "
+        "PRIMARY KEY (target, source_key))"
+    )
+    return conn
+
+
+def _cache_lookup(conn, texts, target_lang):
+    found = {}
+    keys = [_key(text) for text in texts]
+    # Stay well under SQLite's limit on bound parameters
+    for i in range(0, len(keys), 500):
+        batch = keys[i:i + 500]
+        rows = conn.execute(
+            f"SELECT source_key, translated FROM translations WHERE target = ? AND source_key IN ({','.join('?' * len(batch))})",
+            [target_lang, *batch]
+        )
+        found.update(rows)
+    return {text: found[_key(text)] for text in texts if _key(text) in found}
+
+
+def _cache_store(conn, translations, target_lang):
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO translations (target, source_key, translated) VALUES (?, ?, ?)",
+            [(target_lang, _key(text), translated) for text, translated in translations.items()]
+        )
+
+
+# ---------------- Public API ----------------
+def _chunks(texts):
+    chunk, size = [], 0
+    for text in texts:
+        if chunk and (len(chunk) >= TRANSLATION_CHUNK_SIZE or size + len(text) > MAX_CHUNK_CHARS):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(text)
+        size += len(text) + 1
+    if chunk:
+        yield chunk
+
+
+def _translate_chunk(backend, chunk, target_lang):
+    try:
+        with metrics.timed("translation_batch_seconds", backend=type(backend).__name__):
+            return dict(zip(chunk, backend.translate_batch(chunk, target_lang)))
+    except Exception as e:
+        print(f"Translation Error: {e}")
+        return {}
+
+
+def translate_many(texts, target_lang):
+    # Returns translations in the same order as texts; anything that fails stays untranslated
+    if target_lang == 'en' or not texts:
+        return list(texts)
+
+    # Newlines are the separator between strings in a batched request
+    pending = list(dict.fromkeys(" ".join(text.split("\n")) for text in texts if text))
+    try:
+        conn = _connect()
+    except sqlite3.Error as e:
+        print(f"Translation cache unavailable: {e}")
+        conn = None
+
+    translated = _cache_lookup(conn, pending, target_lang) if conn else {}
+    misses = [text for text in pending if text not in translated]
+    metrics.inc("translation_strings_total", len(pending) - len(misses), result="hit")
+    metrics.inc("translation_strings_total", len(misses), result="miss")
+
+    if misses:
+        backend = get_backend()
+        with ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY) as pool:
+            results = pool.map(lambda chunk: _translate_chunk(backend, chunk, target_lang), _chunks(misses))
+            fresh = {}
+            for result in results:
+                fresh.update(result)
+        if conn and fresh:
+            _cache_store(conn, fresh, target_lang)
+        translated.update(fresh)
+
+    if conn:
+        conn.close()
+    return [translated.get(" ".join(text.split("\n")), text) if text else text for text in texts]
+
+
+def translate(text, target_lang):
+    return translate_many([text], target_lang)[0]
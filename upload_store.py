@@ -0,0 +1,124 @@
+# upload_store.py
+# Content-addressed storage for uploaded notes. The upload is copied to disk in chunks while
+# its SHA-256 is computed, capped at UPLOAD_MAX_MB, and stored as objects/<sha256><ext>, so
+# the same file uploaded twice (under any name) is kept once. The "uploads" collection counts
+# how many pending generations still need each object; prune() deletes the ones nobody needs.
+#
+# The stored name doubles as the content key downstream (extraction cache, job ids in logs).
+
+import os
+import re
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", 50))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Unreferenced objects are kept this long, so a re-upload right after generation is free
+UPLOAD_GRACE_HOURS = int(os.environ.get("UPLOAD_GRACE_HOURS", 1))
+# Safety net for references that were never released (e.g. a job result nobody collected)
+UPLOAD_MAX_AGE_DAYS = int(os.environ.get("UPLOAD_MAX_AGE_DAYS", 7))
+
+_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]{1,5})?$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def object_dir(upload_dir):
+    return os.path.join(upload_dir, "objects")
+
+
+def path_for(upload_dir, name):
+    # Returns the object's path, or None if name isn't a stored object name
+    if not name or not _NAME_PATTERN.match(name):
+        return None
+    return os.path.join(object_dir(upload_dir), name)
+
+
+def content_hash(name):
+    return name.split(".", 1)[0]
+
+
+def save_upload(db, file_storage, upload_dir, max_bytes=None):
+    # Returns the stored name (<sha256><ext>); raises UploadTooLarge past max_bytes
+    max_bytes = max_bytes or UPLOAD_MAX_MB * 1024 * 1024
+    ext = os.path.splitext(file_storage.filename or "")[1].lower()
+    directory = object_dir(upload_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    tmp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            for chunk in iter(lambda: file_storage.stream.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                out.write(chunk)
+
+        name = f"{digest.hexdigest()}{ext}"
+        now = datetime.utcnow()
+        db["uploads"].update_one(
+            {"_id": name},
+            {"$inc": {"refs": 1},
+             "$set": {"last_used": now},
+             "$setOnInsert": {"size": size, "created_at": now}},
+            upsert=True
+        )
+        # Replacing an existing object swaps in identical bytes, so a duplicate costs no extra
+        # disk, and it restores the file if a concurrent prune() had just removed it (prune
+        # only ever deletes a renamed copy, see _remove_object)
+        os.replace(tmp_path, os.path.join(directory, name))
+        return name
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def release(db, name):
+    # Drops one reference; the file itself goes at the next prune()
+    if not name:
+        return
+    db["uploads"].update_one(
+        {"_id": name, "refs": {"$gt": 0}},
+        {"$inc": {"refs": -1}, "$set": {"last_used": datetime.utcnow()}}
+    )
+
+
+def prune(db, upload_dir):
+    # Deletes objects nothing refers to (after the grace period) and very old ones; returns the count
+    now = datetime.utcnow()
+    stale = db["uploads"].find({"$or": [
+        {"refs": {"$lte": 0}, "last_used": {"$lt": now - timedelta(hours=UPLOAD_GRACE_HOURS)}},
+        {"last_used": {"$lt": now - timedelta(days=UPLOAD_MAX_AGE_DAYS)}},
+    ]}, {"last_used": 1})
+    removed = 0
+    for doc in stale:
+        # Only delete the file if no new upload took a reference in the meantime
+        if db["uploads"].delete_one({"_id": doc["_id"], "last_used": doc["last_used"]}).deleted_count:
+            _remove_object(db, upload_dir, doc["_id"])
+            removed += 1
+    return removed
+
+
+def _remove_object(db, upload_dir, name):
+    # A save_upload() of the same content can run at any point in here. The file is moved aside
+    # first, so a copy that upload puts back is never the one deleted; if the upload's reference
+    # already exists, the moved file (identical bytes) goes back in place instead
+    path = path_for(upload_dir, name)
+    if not path:
+        return
+    tombstone = os.path.join(object_dir(upload_dir), f".prune-{uuid.uuid4().hex}.tmp")
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return
+    if db["uploads"].find_one({"_id": name}, {"_id": 1}):
+        os.replace(tombstone, path)
+    else:
+        os.remove(tombstone)
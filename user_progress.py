@@ -3,9 +3,42 @@
 from flask import Blueprint, request, session, jsonify, current_app, render_template
 from bson import ObjectId
 from datetime import datetime
+import os
+import time
+import threading
 
 progress_bp = Blueprint("progress", __name__)
 
+# ---------------- Chart cache ----------------
+# progress.js reloads the chart often; the payload only changes when update_progress runs
+CHART_CACHE_TTL = int(os.environ.get("CHART_CACHE_TTL", 30))
+CHART_CACHE_MAX_USERS = 10000
+_chart_cache = {}  # user_id -> (expires_at, payload)
+_chart_lock = threading.Lock()
+
+
+def _cached_chart(user_id):
+    entry = _chart_cache.get(user_id)
+    if entry and entry[0] > time.time():
+        return entry[1]
+    return None
+
+
+def _store_chart(user_id, payload):
+    with _chart_lock:
+        if len(_chart_cache) >= CHART_CACHE_MAX_USERS:
+            now = time.time()
+            for key in [k for k, (expires, _) in _chart_cache.items() if expires <= now]:
+                del _chart_cache[key]
+            if len(_chart_cache) >= CHART_CACHE_MAX_USERS:
+                _chart_cache.clear()
+        _chart_cache[user_id] = (time.time() + CHART_CACHE_TTL, payload)
+
+
+def invalidate_chart(user_id):
+    with _chart_lock:
+        _chart_cache.pop(str(user_id), None)
+
 # ---------------- Save Quiz Result ----------------
 @progress_bp.route("/save_quiz_result", methods=["POST"])
 def save_quiz_result():
@@ -108,6 +141,7 @@ def update_progress():
         {"$set": record},
         upsert=True
     )
+    invalidate_chart(user_id)
 
     return jsonify({"ok": True})
 
@@ -128,15 +162,23 @@ def get_progress():
     if "user_id" not in session:
         return jsonify({"sets": [], "accuracy": []})
 
+    cached = _cached_chart(session["user_id"])
+    if cached is not None:
+        return jsonify(cached)
+
     user_id = ObjectId(session["user_id"])
-    records = list(progress.find({"user_id": user_id}))
+    records = list(progress.find({"user_id": user_id}, {"set_id": 1, "correct": 1, "total_attempts": 1}))
     data = {"sets": [], "accuracy": []}
 
+    # All set names in one query instead of one find_one per record
+    set_ids = list({rec["set_id"] for rec in records})
+    names = {s["_id"]: s.get("name", "Unnamed Set") for s in flashcardsets.find({"_id": {"$in": set_ids}}, {"name": 1})}
+
     for rec in records:
-        set_data = flashcardsets.find_one({"_id": rec["set_id"]})
-        if set_data:
+        if rec["set_id"] in names:
             acc = (rec["correct"] / rec["total_attempts"]) * 100 if rec["total_attempts"] > 0 else 0
-            data["sets"].append(set_data.get("name", "Unnamed Set"))
+            data["sets"].append(names[rec["set_id"]])
             data["accuracy"].append(round(acc, 2))
 
+    _store_chart(session["user_id"], data)
     return jsonify(data)
@@ -0,0 +1,86 @@
+# visuals.py
+# Renders the "visual explanation" image for a card term.
+# File names are derived from the term, so a term that was rendered before is never drawn again,
+# and renders run on a thread pool so the caller doesn't have to wait for them.
+
+import os
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import lazy_deps
+import metrics
+from pools import ProcessLocalPool
+
+OUTPUT_DIR = "static/generated_images"
+VISUAL_FORMAT = os.environ.get("VISUAL_FORMAT", "webp")
+VISUAL_WORKERS = int(os.environ.get("VISUAL_WORKERS", 4))
+# Bump when the drawing code changes so old images aren't reused
+RENDERER_VERSION = 1
+CANVAS_SIZE = (900, 450)
+
+_pool = ProcessLocalPool(lambda: ThreadPoolExecutor(max_workers=VISUAL_WORKERS))
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    # Loaded once per process instead of once per image
+    ImageFont = lazy_deps.load("PIL.ImageFont")
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1)
+def _image_format():
+    features = lazy_deps.load("PIL.features")
+    if VISUAL_FORMAT == "webp" and features.check("webp"):
+        return "webp"
+    return "png"
+
+
+def image_name(term):
+    digest = hashlib.sha1(f"{RENDERER_VERSION}:{term.strip()}".encode("utf-8")).hexdigest()[:20]
+    return f"{digest}.{_image_format()}"
+
+
+def _draw(term, path):
+    Image = lazy_deps.load("PIL.Image")
+    ImageDraw = lazy_deps.load("PIL.ImageDraw")
+    # Black text on white only needs one 8-bit channel
+    img = Image.new("L", CANVAS_SIZE, 255)
+    ImageDraw.Draw(img).text((40, 20), term, fill=0, font=_font(42))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if path.endswith(".webp"):
+        img.save(tmp_path, "WEBP", lossless=True, method=6)
+    else:
+        img.save(tmp_path, "PNG", optimize=True)
+    os.replace(tmp_path, path)
+
+
+def render(term):
+    # Returns the path relative to static/, or None if drawing failed
+    name = image_name(term)
+    path = os.path.join(OUTPUT_DIR, name)
+    try:
+        if not os.path.exists(path):
+            with metrics.timed("visual_render_seconds"):
+                _draw(term.strip(), path)
+    except Exception as e:
+        print(f"Visual Error: {e}")
+        return None
+    return f"generated_images/{name}"
+
+
+def render_async(term):
+    # The path is known up front, so the card can go out while the image is drawn in the background
+    _pool.get().submit(render, term)
+    return f"generated_images/{image_name(term)}"
+
+
+def render_many(terms):
+    return list(_pool.get().map(render, terms))